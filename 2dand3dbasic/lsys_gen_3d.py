@@ -10,10 +10,8 @@ class LSystem:
 
     def generate(self):
         for _ in range(self.iterations):
-            next_sentence = ""
-            for char in self.sentence:
-                next_sentence += self.rules.get(char, char)
-            self.sentence = next_sentence
+            # Join the successors in one pass instead of concatenating per character
+            self.sentence = "".join(map(self.rules.get, self.sentence, self.sentence))
 
     def get_sentence(self):
         return self.sentence
@@ -0,0 +1,2 @@
+rem One Blender session per worker for a whole manifest of trees, see lsys_batch.py
+"C:\Program Files\Blender Foundation\Blender 4.1\blender.exe" --background --python "C:\Users\andre\Dropbox\Code\Tree_Render\lsys_batch.py" -- "C:\Users\andre\Dropbox\Code\Tree_Render\batch_manifest.json" "C:\Users\andre\Dropbox\Code\Tree_Render\batch_output" --workers 4
@@ -0,0 +1,84 @@
+import argparse
+import time
+
+import numpy as np
+
+import lsys_branching
+
+
+def sample_points(branches):
+    """The crowding samples of every branch, as grow_branches checks them, and their owners"""
+    samples = lsys_branching._samples(branches.points[:, 1], branches.points[:, 2])
+    return samples.reshape(-1, 3), np.repeat(np.arange(len(samples)), samples.shape[1])
+
+
+def grid_pairs(points, owner, clearance):
+    """Close sample pairs of different branches through lsys_branching.SpatialHash"""
+    grid = lsys_branching.SpatialHash(2 * clearance)
+    grid.insert(points, owner)
+    query, index, _ = grid.neighbours(points, clearance)
+    return int(np.count_nonzero(grid.owner[index] != owner[query]))
+
+
+def brute_pairs(points, owner, clearance, chunk_rows=2048):
+    """The same count by checking every sample against every other one, O(n^2)"""
+    count = 0
+    for start in range(0, len(points), chunk_rows):
+        block = points[start:start + chunk_rows]
+        distance = np.linalg.norm(block[:, None, :] - points[None, :, :], axis=2)
+        close = (distance < clearance) & (owner[start:start + chunk_rows, None] != owner[None, :])
+        count += int(np.count_nonzero(close))
+    return count
+
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost of clearance checks while growing bendy branching trees")
+    parser.add_argument("--min-levels", type=int, default=4)
+    parser.add_argument("--max-levels", type=int, default=7, help="7 levels grow about 50-70k segments")
+    parser.add_argument("--clearance", type=float, default=0.02)
+    parser.add_argument("--open-space", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--compare", action="store_true",
+                        help="also time an all-pairs check of the grown tree against the spatial hash")
+    parser.add_argument("--max-brute", type=int, default=20_000,
+                        help="skip the all-pairs check for trees with more segments than this")
+    args = parser.parse_args()
+
+    header = f"{'levels':>6}{'segments':>11}{'plain s':>10}{'clearance s':>13}{'us/segment':>12}"
+    if args.compare:
+        header += f"{'hash s':>10}{'all-pairs s':>13}{'speedup':>9}"
+    print(header)
+    for levels in range(args.min_levels, args.max_levels + 1):
+        params = dict(branch_count=levels, max_height=7, branch_length_reduction=0.85, seed=args.seed)
+        _, plain_seconds = best_time(lambda: lsys_branching.grow_branches(**params), args.repeat)
+        branches, seconds = best_time(lambda: lsys_branching.grow_branches(
+            **params, clearance=args.clearance, open_space=args.open_space), args.repeat)
+        n = len(branches.parent)
+        line = f"{levels:>6}{n:>11,}{plain_seconds:>10.4f}{seconds:>13.4f}{1e6 * seconds / n:>12.1f}"
+        if args.compare:
+            points, owner = sample_points(branches)
+            pairs, hash_seconds = best_time(lambda: grid_pairs(points, owner, args.clearance), args.repeat)
+            line += f"{hash_seconds:>10.4f}"
+            if n <= args.max_brute:
+                brute, brute_seconds = best_time(lambda: brute_pairs(points, owner, args.clearance), 1)
+                if brute != pairs:
+                    raise SystemExit(f"Spatial hash found {pairs} close pairs, all-pairs check {brute}")
+                line += f"{brute_seconds:>13.4f}{brute_seconds / max(hash_seconds, 1e-9):>8.1f}x"
+            else:
+                line += "  all-pairs skipped (> --max-brute)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
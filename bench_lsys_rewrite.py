@@ -0,0 +1,79 @@
+import argparse
+import random
+import time
+
+import lsys_rewrite
+from genlsys_3d_robust import l_systems
+
+
+def legacy_generate(axiom, rules, iterations, stochastic=False):
+    """The original per-character concatenation loop, kept for comparison"""
+    l_system_string = axiom
+    for _ in range(iterations):
+        next_string = ""
+        for char in l_system_string:
+            if stochastic and char in rules and isinstance(rules[char], list):
+                next_string += random.choice(rules[char])
+            else:
+                next_string += rules.get(char, char)
+        l_system_string = next_string
+    return l_system_string
+
+
+def predicted_length(axiom, rules, iterations):
+    """Upper bound on the string length, using the longest alternative of stochastic rules"""
+    counts = {}
+    for char in axiom:
+        counts[char] = counts.get(char, 0) + 1
+    for _ in range(iterations):
+        next_counts = {}
+        for char, count in counts.items():
+            successor = rules.get(char, char)
+            if isinstance(successor, list):
+                successor = max(successor, key=len)
+            for c in successor:
+                next_counts[c] = next_counts.get(c, 0) + count
+        counts = next_counts
+    return sum(counts.values())
+
+
+def time_generate(generate, l_system, iterations, repeat):
+    best = None
+    for _ in range(repeat):
+        random.seed(0)
+        start = time.perf_counter()
+        result = generate(l_system["axiom"], l_system["rules"], iterations, l_system["stochastic"])
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(result), best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Symbols/second of L-system rewriting for every config in l_systems")
+    parser.add_argument("--min-iterations", type=int, default=5)
+    parser.add_argument("--max-iterations", type=int, default=10)
+    parser.add_argument("--max-symbols", type=int, default=50_000_000,
+                        help="skip runs whose output would be longer than this")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--compare", action="store_true", help="also time the original concatenation loop")
+    args = parser.parse_args()
+
+    header = f"{'config':<20}{'iter':>5}{'symbols':>14}{'seconds':>11}{'symbols/s':>14}"
+    if args.compare:
+        header += f"{'legacy s':>11}{'speedup':>9}"
+    print(header)
+    for l_system in l_systems:
+        for iterations in range(args.min_iterations, args.max_iterations + 1):
+            if predicted_length(l_system["axiom"], l_system["rules"], iterations) > args.max_symbols:
+                print(f"{l_system['name']:<20}{iterations:>5}{'skipped (> --max-symbols)':>39}")
+                break
+            symbols, seconds = time_generate(lsys_rewrite.generate, l_system, iterations, args.repeat)
+            line = f"{l_system['name']:<20}{iterations:>5}{symbols:>14,}{seconds:>11.4f}{symbols / max(seconds, 1e-9):>14,.0f}"
+            if args.compare:
+                _, legacy_seconds = time_generate(legacy_generate, l_system, iterations, 1)
+                line += f"{legacy_seconds:>11.4f}{legacy_seconds / max(seconds, 1e-9):>8.1f}x"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
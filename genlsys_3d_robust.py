@@ -1,43 +1,31 @@
 import random
 import os
 
-def generate_l_system(axiom, rules, iterations, stochastic=False):
-    l_system_string = axiom
-    for _ in range(iterations):
-        next_string = ""
-        for char in l_system_string:
-            if stochastic and char in rules and isinstance(rules[char], list):
-                next_string += random.choice(rules[char])
-            else:
-                next_string += rules.get(char, char)
-        l_system_string = next_string
-    return l_system_string
+import lsys_analytics
+import lsys_param
+import lsys_rewrite
+import lsys_stream
 
-def generate_param_l_system(axiom, rules, iterations, stochastic=False):
-    l_system_string = axiom
-    for _ in range(iterations):
-        next_string = ""
-        i = 0
-        while i < len(l_system_string):
-            char = l_system_string[i]
-            if char in rules:
-                params = ""
-                if l_system_string[i + 1] == '(':
-                    i += 1
-                    while l_system_string[i] != ')':
-                        params += l_system_string[i]
-                        i += 1
-                    params += ')'
-                if stochastic and isinstance(rules[char], list):
-                    rule = random.choice(rules[char])
-                else:
-                    rule = rules[char]
-                next_string += rule.format(*params.strip('()').split(',')) if params else rule
-            else:
-                next_string += char
-            i += 1
-        l_system_string = next_string
-    return l_system_string
+def rng_choice(seed=None):
+    """choice() of a private random.Random(seed), or of the global random module when seed is None"""
+    return random.choice if seed is None else random.Random(seed).choice
+
+def generate_l_system(axiom, rules, iterations, stochastic=False, cache=None, seed=None):
+    # A deterministic config can reuse expansions of (symbol, depth) from an
+    # lsys_cache.ExpansionCache built for the same rules
+    if cache is not None and not stochastic:
+        if cache.rules != rules:
+            raise ValueError("Expansion cache was built for different rules")
+        return cache.expand_string(axiom, iterations)
+    # Each generation is built from a compiled translation table / chunk list rather than
+    # per-character string concatenation, see lsys_rewrite.py
+    return lsys_rewrite.generate(axiom, rules, iterations, stochastic, rng_choice(seed))
+
+def generate_param_l_system(axiom, rules, iterations, stochastic=False, seed=None):
+    # Modules are parsed once and every parameter is evaluated each generation,
+    # so the strings stay short, see lsys_param.py
+    modules = lsys_param.generate(axiom, rules, iterations, stochastic, rng_choice(seed))
+    return lsys_param.format_modules(modules)
 
 # Parameterized L-system configurations
 param_l_systems = [
@@ -193,25 +181,47 @@ l_systems = [
     }
 ]
 
-# Generate L-systems and save to text files
-output_dir = "C:\\Users\\andre\\Dropbox\\Code\\Tree_Render\\LSystems"
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
+if __name__ == "__main__":
+    import argparse
+
+    import lsys_binfile
+
+    parser = argparse.ArgumentParser(description="Generate the L-system configs and save them to files")
+    parser.add_argument("--output-dir", default="C:\\Users\\andre\\Dropbox\\Code\\Tree_Render\\LSystems")
+    parser.add_argument("--binary", action="store_true",
+                        help="write the non-parameterized configs as block-compressed .lsyb files (lsys_binfile)")
+    parser.add_argument("--codec", choices=lsys_binfile.CODECS, default="zlib", help="codec of the .lsyb blocks")
+    args = parser.parse_args()
+
+    # Generate L-systems and save to text files, or .lsyb with --binary
+    output_dir = args.output_dir
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    # Refuse configs that would expand past this many symbols, checked without expanding them
+    max_symbols = 100_000_000
 
-# Generate non-parameterized L-systems
-for l_system in l_systems:
-    l_system_string = generate_l_system(l_system["axiom"], l_system["rules"], l_system["iterations"], l_system["stochastic"])
-    file_suffix = "stochastic" if l_system["stochastic"] else "deterministic"
-    file_path = os.path.join(output_dir, f"{l_system['name']}_{file_suffix}.txt")
-    with open(file_path, "w") as file:
-        file.write(l_system_string)
-    print(f"Generated {file_suffix} L-system for {l_system['name']} and saved to {file_path}")
+    # Generate non-parameterized L-systems
+    for l_system in l_systems:
+        lsys_analytics.check_config_budget(l_system, max_symbols)
+        file_suffix = "stochastic" if l_system["stochastic"] else "deterministic"
+        # Stream the expansion so deep iterations are never held in memory as one string
+        chunks = lsys_stream.iter_l_system_chunks(l_system["axiom"], l_system["rules"], l_system["iterations"], l_system["stochastic"])
+        if args.binary:
+            file_path = os.path.join(output_dir, f"{l_system['name']}_{file_suffix}.lsyb")
+            lsys_binfile.write_lsystem_file(file_path, chunks, config=l_system["name"], iterations=l_system["iterations"], codec=args.codec)
+        else:
+            file_path = os.path.join(output_dir, f"{l_system['name']}_{file_suffix}.txt")
+            with open(file_path, "w") as file:
+                file.writelines(chunks)
+        print(f"Generated {file_suffix} L-system for {l_system['name']} and saved to {file_path}")
 
-# Generate parameterized L-systems
-for l_system in param_l_systems:
-    l_system_string = generate_param_l_system(l_system["axiom"], l_system["rules"], l_system["iterations"], l_system["stochastic"])
-    file_suffix = "stochastic" if l_system["stochastic"] else "deterministic"
-    file_path = os.path.join(output_dir, f"{l_system['name']}_{file_suffix}.txt")
-    with open(file_path, "w") as file:
-        file.write(l_system_string)
-    print(f"Generated {file_suffix} parameterized L-system for {l_system['name']} and saved to {file_path}")
+    # Generate parameterized L-systems
+    for l_system in param_l_systems:
+        lsys_analytics.check_config_budget(l_system, max_symbols, parametric=True)
+        l_system_string = generate_param_l_system(l_system["axiom"], l_system["rules"], l_system["iterations"], l_system["stochastic"])
+        file_suffix = "stochastic" if l_system["stochastic"] else "deterministic"
+        file_path = os.path.join(output_dir, f"{l_system['name']}_{file_suffix}.txt")
+        with open(file_path, "w") as file:
+            file.write(l_system_string)
+        print(f"Generated {file_suffix} parameterized L-system for {l_system['name']} and saved to {file_path}")
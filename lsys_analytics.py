@@ -0,0 +1,121 @@
+import numpy as np
+
+import lsys_param
+
+# Symbols the turtle interpreters draw a segment for; the leaf-enabled
+# interpreter also places one leaf per segment.
+SEGMENT_SYMBOLS = "F"
+
+
+def _rule_successors(rules, parametric):
+    """Map each predecessor symbol to its list of successors as symbol sequences"""
+    successors = {}
+    for predecessor, successor in rules.items():
+        if parametric:
+            ((symbol, _),) = lsys_param.split_modules(predecessor)
+        else:
+            symbol = predecessor
+        alternatives = successor if isinstance(successor, list) else [successor]
+        if parametric:
+            alternatives = [[s for s, _ in lsys_param.split_modules(a)] for a in alternatives]
+        successors[symbol] = alternatives
+    return successors
+
+
+def _axiom_symbols(axiom, parametric):
+    if parametric:
+        return [symbol for symbol, _ in lsys_param.split_modules(axiom)]
+    return list(axiom)
+
+
+def production_matrix(axiom, rules, parametric=False):
+    """Build the production matrix of a config.
+
+    Returns (alphabet, M, v0) where M[i, j] is the number of alphabet[j]
+    produced from one alphabet[i] and v0 counts the axiom symbols. For rules
+    with alternatives M holds the expected count, each alternative being
+    equally likely as with random.choice. Deterministic configs use Python
+    integers so counts stay exact at any depth.
+
+    Parametric rules are matched on symbol only, so a rule whose arity does
+    not match some modules of that symbol overcounts them.
+    """
+    successors = _rule_successors(rules, parametric)
+    axiom_symbols = _axiom_symbols(axiom, parametric)
+    alphabet = []
+    for symbols in [axiom_symbols, list(successors)] + [s for alts in successors.values() for s in alts]:
+        for symbol in symbols:
+            if symbol not in alphabet:
+                alphabet.append(symbol)
+    index = {symbol: i for i, symbol in enumerate(alphabet)}
+
+    stochastic = any(len(alternatives) > 1 for alternatives in successors.values())
+    dtype = float if stochastic else object
+    matrix = np.zeros((len(alphabet), len(alphabet)), dtype=dtype)
+    for i, symbol in enumerate(alphabet):
+        if symbol not in successors:
+            matrix[i, i] = 1
+            continue
+        alternatives = successors[symbol]
+        for alternative in alternatives:
+            for produced in alternative:
+                if stochastic:
+                    matrix[i, index[produced]] += 1.0 / len(alternatives)
+                else:
+                    matrix[i, index[produced]] += 1
+    v0 = np.zeros(len(alphabet), dtype=dtype)
+    for symbol in axiom_symbols:
+        v0[index[symbol]] += 1
+    return alphabet, matrix, v0
+
+
+def symbol_counts(axiom, rules, iterations, parametric=False):
+    """Return {symbol: count} after the given iterations without expanding the string.
+
+    Uses v0 @ M**iterations by repeated squaring, so the cost is
+    O(alphabet**3 * log(iterations)) whatever the string length. Counts are
+    expectations for stochastic rules.
+    """
+    alphabet, matrix, v0 = production_matrix(axiom, rules, parametric)
+    counts = v0 @ np.linalg.matrix_power(matrix, iterations)
+    return {symbol: counts[i] for i, symbol in enumerate(alphabet)}
+
+
+def predict_config(config, iterations=None, parametric=False):
+    """Summarize what a config in l_systems / param_l_systems produces at N iterations"""
+    iterations = config["iterations"] if iterations is None else iterations
+    counts = symbol_counts(config["axiom"], config["rules"], iterations, parametric)
+    segments = sum(counts.get(symbol, 0) for symbol in SEGMENT_SYMBOLS)
+    return {
+        "name": config["name"],
+        "iterations": iterations,
+        "expected": config["stochastic"],
+        "length": sum(counts.values()),
+        "segments": segments,
+        "branches": counts.get("[", 0),
+        "leaves": segments,
+        "counts": counts,
+    }
+
+
+def check_config_budget(config, max_symbols, iterations=None, parametric=False):
+    """Raise ValueError if a config would expand to more than max_symbols modules"""
+    prediction = predict_config(config, iterations, parametric)
+    if prediction["length"] > max_symbols:
+        raise ValueError(
+            f"{config['name']} at {prediction['iterations']} iterations expands to "
+            f"{prediction['length']:,.0f} symbols, over the budget of {max_symbols:,}"
+        )
+    return prediction
+
+
+if __name__ == "__main__":
+    from genlsys_3d_robust import l_systems, param_l_systems
+
+    for configs, parametric in [(l_systems, False), (param_l_systems, True)]:
+        for config in configs:
+            prediction = predict_config(config, parametric=parametric)
+            kind = "expected" if prediction["expected"] else "exact"
+            print(f"{config['name']:<26}{prediction['iterations']:>4} iterations  "
+                  f"{kind:>8}  length {prediction['length']:>14,.0f}  "
+                  f"segments {prediction['segments']:>12,.0f}  branches {prediction['branches']:>10,.0f}")
@@ -0,0 +1,265 @@
+import hashlib
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+import traceback
+from contextlib import nullcontext
+
+# Blender needs the folder on sys.path first, see lsys_cli.script_args
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import lsys_cli
+import lsys_export
+import lsys_instances
+import lsys_mesh
+import lsys_metrics
+import lsys_turtle
+from lsys_variants import generate_variant
+
+# Defaults for manifest entries, matching the Blender scripts
+JOB_DEFAULTS = {
+    "angle": 25.7,
+    "length": 1.0,
+    "branch_thickness": 0.05,
+    "branch_taper": 0.8,
+    "leaf_scale": 0.125,
+    "leaves": False,
+}
+
+
+def load_manifest(file_path):
+    """Read a batch manifest: a JSON list of jobs, or {"defaults": {...}, "jobs": [...]}.
+
+    Every job names a config of genlsys_3d_robust.l_systems and a seed, and
+    may override its iterations and the JOB_DEFAULTS geometry parameters:
+        {"config": "FractalPlant", "seed": 3, "iterations": 5, "branch_taper": 0.7}
+    """
+    with open(file_path, "r") as file:
+        manifest = json.load(file)
+    defaults = dict(JOB_DEFAULTS)
+    if isinstance(manifest, dict):
+        defaults.update(manifest.get("defaults", {}))
+        manifest = manifest["jobs"]
+    jobs = []
+    for entry in manifest:
+        if "config" not in entry:
+            raise ValueError(f"Manifest entry {entry!r} has no config")
+        _find_config(entry["config"])
+        job = dict(defaults, seed=0)
+        job.update(entry)
+        job.setdefault("name", f"{job['config']}_seed{job['seed']}")
+        jobs.append(job)
+    return jobs
+
+
+def shard_path(output_dir, name, extension, shard_width=2):
+    """output_dir/<first shard_width hex digits of sha1(name)>/name + extension.
+
+    Spreads thousands of outputs over at most 16 ** shard_width folders and
+    gives every tree a fixed place that does not depend on the batch order.
+    """
+    shard = hashlib.sha1(name.encode("utf-8")).hexdigest()[:shard_width]
+    return os.path.join(output_dir, shard, name + extension)
+
+
+def _find_config(name):
+    from genlsys_3d_robust import l_systems, param_l_systems
+
+    for config in l_systems:
+        if config["name"] == name:
+            return config
+    # The turtle reads one character per symbol and has no parametric interpreter
+    if any(config["name"] == name for config in param_l_systems):
+        raise ValueError(f"L-system config {name!r} is parametric, batches only take l_systems configs")
+    raise ValueError(f"Unknown L-system config {name!r}")
+
+
+def build_tree(job, metrics=None):
+    """Expand, interpret and mesh one job; returns (segments, branches, leaves) with no Blender involved"""
+    config = _find_config(job["config"])
+    if "iterations" in job:
+        config = dict(config, iterations=job["iterations"])
+    l_system_string = generate_variant(config, job["seed"])
+    # Curves without brackets (Dragon, Koch, Hilbert ...) are interpreted with one prefix scan
+    interpret = lsys_turtle.interpret_scan if "[" not in l_system_string else lsys_turtle.interpret
+    segments = interpret(l_system_string, math.radians(job["angle"]), job["length"],
+                         job["branch_thickness"], metrics=metrics)
+    with metrics.timer("mesh") if metrics is not None else nullcontext():
+        branches = lsys_mesh.tube_mesh(segments, taper=job["branch_taper"])
+        leaves = lsys_instances.leaf_instances(segments, job["leaf_scale"]) if job["leaves"] else None
+    return segments, branches, leaves
+
+
+class ExportWriter:
+    """Writer backend for headless servers: engine-ready .glb or .obj files through lsys_export"""
+
+    def __init__(self, file_format="glb", leaf_obj_path=None):
+        self.extension = "." + file_format
+        self.write_file = lsys_export.write_glb if file_format == "glb" else lsys_export.write_obj
+        self.leaf_mesh = lsys_export.read_obj(leaf_obj_path) if leaf_obj_path else None
+
+    def reset(self):
+        pass
+
+    def write(self, job, branches, leaves, file_path):
+        if self.leaf_mesh is None:
+            leaves = None
+        self.write_file(file_path, branches, leaves, self.leaf_mesh, name=job["name"])
+
+
+class BlenderWriter:
+    """Writer backend for a running Blender: one .blend per tree, from one session"""
+
+    extension = ".blend"
+
+    def __init__(self, leaf_obj_path=None):
+        self.leaf_obj_path = leaf_obj_path
+
+    def reset(self):
+        import bpy
+
+        # Start every tree from an empty file instead of a new Blender process
+        bpy.ops.wm.read_homefile(use_empty=True)
+
+    def write(self, job, branches, leaves, file_path):
+        import bpy
+
+        import lsys_blender
+
+        tree_collection = bpy.data.collections.new("LSystemTree")
+        bpy.context.scene.collection.children.link(tree_collection)
+        lsys_blender.object_from_arrays("LSystemTreeBranches", branches, tree_collection)
+        if leaves is not None and self.leaf_obj_path:
+            bpy.ops.wm.obj_import(filepath=self.leaf_obj_path)
+            leaf_obj = bpy.context.selected_objects[0]
+            leaf_obj.name = "Leaf"
+            bpy.context.collection.objects.unlink(leaf_obj)
+            lsys_blender.instancer_from_arrays("Leaves", leaves, leaf_obj, tree_collection)
+        bpy.ops.wm.save_as_mainfile(filepath=os.path.abspath(file_path))
+
+
+class MockWriter(BlenderWriter):
+    """BlenderWriter on machines without Blender, through the lsys_mockbpy stand-in for bpy.
+
+    The real BlenderWriter and lsys_blender code runs against it, with the
+    same jobs, sharding and index, so the whole batch pipeline can be
+    exercised on CI. Each tree's mesh data is saved as .npz.
+    """
+
+    extension = ".npz"
+
+    def __init__(self, leaf_obj_path=None):
+        import lsys_mockbpy
+
+        bpy = sys.modules.setdefault("bpy", lsys_mockbpy)
+        if bpy is not lsys_mockbpy:
+            raise ValueError("The mock backend replaces bpy, use the blender backend inside Blender")
+        super().__init__(leaf_obj_path)
+
+
+def run_batch(jobs, output_dir, writer, shard=0, shard_count=1):
+    """Build and write every shard_count-th job starting at shard, resetting the scene in between.
+
+    Writes one JSON line per tree to output_dir/index-<shard>.jsonl
+    (name, config, seed, output path, segment and vertex counts and the
+    lsys_metrics summary) and returns those records. The index is rewritten
+    on every run, so rerunning a shard replaces its records. A job that
+    fails is logged and recorded with its error instead of stopping the
+    shard.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    records = []
+    index_path = os.path.join(output_dir, f"index-{shard}.jsonl")
+    with open(index_path, "w") as index:
+        for job in jobs[shard::shard_count]:
+            try:
+                record = _run_job(job, output_dir, writer)
+            except Exception as error:
+                traceback.print_exc()
+                record = {"name": job["name"], "config": job["config"], "seed": job["seed"],
+                          "error": f"{type(error).__name__}: {error}"}
+                print(f"[{shard}/{shard_count}] {job['name']} failed, skipped", file=sys.stderr, flush=True)
+            else:
+                print(f"[{shard}/{shard_count}] {job['name']} -> {record['path']}", flush=True)
+            index.write(json.dumps(record) + "\n")
+            index.flush()
+            records.append(record)
+    return records
+
+
+def _run_job(job, output_dir, writer):
+    metrics = lsys_metrics.TurtleMetrics(job["name"], progress=None)
+    writer.reset()
+    segments, branches, leaves = build_tree(job, metrics)
+    file_path = shard_path(output_dir, job["name"], writer.extension)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with metrics.timer("write"):
+        writer.write(job, branches, leaves, file_path)
+    return {
+        "name": job["name"],
+        "config": job["config"],
+        "seed": job["seed"],
+        "path": os.path.relpath(file_path, output_dir),
+        "segments": len(segments.start),
+        "vertices": len(branches.vertices),
+        "metrics": metrics.summary(),
+    }
+
+
+def _worker_command(backend, arguments):
+    if backend == "blender":
+        import bpy
+
+        return [bpy.app.binary_path, "--background", "--python", os.path.abspath(__file__), "--"] + arguments
+    return [sys.executable, os.path.abspath(__file__)] + arguments
+
+
+def main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate many L-system trees in one process per worker")
+    parser.add_argument("manifest", help="JSON list of jobs, see load_manifest")
+    parser.add_argument("output_dir")
+    parser.add_argument("--backend", choices=("blender", "glb", "obj", "mock"), default=None,
+                        help="default: blender when running inside Blender, mock otherwise")
+    parser.add_argument("--workers", type=int, default=1, help="processes to spread the jobs over")
+    parser.add_argument("--shard", default="0/1", help="i/n: handle every n-th job starting at i")
+    parser.add_argument("--leaf-obj", default=None, help="leaf .obj to instance when a job sets leaves")
+    args = parser.parse_args(argv)
+
+    backend = args.backend
+    if backend is None:
+        backend = "blender" if "bpy" in sys.modules else "mock"
+    jobs = load_manifest(args.manifest)
+
+    if args.workers > 1:
+        # One process per worker, each one running its shard in a single session
+        base = [args.manifest, args.output_dir, "--backend", backend]
+        if args.leaf_obj:
+            base += ["--leaf-obj", args.leaf_obj]
+        workers = [subprocess.Popen(_worker_command(backend, base + ["--shard", f"{i}/{args.workers}"]))
+                   for i in range(args.workers)]
+        failed = [worker.args for worker in workers if worker.wait() != 0]
+        if failed:
+            raise SystemExit(f"{len(failed)} batch workers failed")
+        return
+
+    shard, shard_count = (int(part) for part in args.shard.split("/"))
+    if backend == "blender":
+        writer = BlenderWriter(args.leaf_obj)
+    elif backend in ("glb", "obj"):
+        writer = ExportWriter(backend, args.leaf_obj)
+    else:
+        writer = MockWriter(args.leaf_obj)
+    started = time.perf_counter()
+    records = run_batch(jobs, args.output_dir, writer, shard, shard_count)
+    failed = sum("error" in record for record in records)
+    print(f"Wrote {len(records) - failed} trees to {args.output_dir} in {time.perf_counter() - started:.1f}s")
+    if failed:
+        raise SystemExit(f"{failed} jobs failed, see the error fields of index-{shard}.jsonl")
+
+
+if __name__ == "__main__":
+    main(lsys_cli.script_args())
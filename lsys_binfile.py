@@ -0,0 +1,275 @@
+import json
+import lzma
+import mmap
+import re
+import struct
+import zlib
+
+import numpy as np
+
+import lsys_brackets
+
+# File layout, written front to back so expansion can be streamed into it:
+#   MAGIC
+#   data blocks, each encoded on its own
+#   header      JSON: config, iterations, seed, symbol counts, codec, ...
+#   block table uint64 (n_blocks, 3): first symbol, byte offset, byte size
+#   bracket index [open, close] symbol positions of n_pairs pairs, stored as
+#               the gaps between opening positions followed by the pair
+#               spans (uint32 unless the string is longer than 2**32
+#               symbols), encoded with the codec of the data blocks; left
+#               out of uncompressed files, where it would outgrow the text
+#   trailer     offsets and sizes of the three sections above, then MAGIC
+MAGIC = b"LSYB\x01"
+TRAILER = struct.Struct("<QQQQQQ5s")
+CODECS = ("none", "zlib", "lzma")
+
+# Runs of at least RLE_MIN_RUN identical symbols are stored as
+# RLE_ESCAPE, symbol, uint32 count. Symbols are ASCII so the escape never
+# collides with data.
+RLE_ESCAPE = b"\xff"
+RLE_MIN_RUN = 8
+_RUN = re.compile(rb"(.)\1{%d,}" % (RLE_MIN_RUN - 1), re.S)
+_RUN_COUNT = struct.Struct("<I")
+
+
+def rle_encode(data):
+    return _RUN.sub(lambda m: RLE_ESCAPE + m.group(1) + _RUN_COUNT.pack(len(m.group())), data)
+
+
+def rle_decode(data):
+    out = bytearray()
+    pos = 0
+    while True:
+        escape = data.find(RLE_ESCAPE, pos)
+        if escape < 0:
+            out += data[pos:]
+            return bytes(out)
+        out += data[pos:escape]
+        out += data[escape + 1:escape + 2] * _RUN_COUNT.unpack_from(data, escape + 2)[0]
+        pos = escape + 2 + _RUN_COUNT.size
+
+
+def _encode_block(data, codec, rle):
+    if rle:
+        data = rle_encode(data)
+    if codec == "zlib":
+        return zlib.compress(data, 6)
+    if codec == "lzma":
+        return lzma.compress(data)
+    return data
+
+
+def _decode_block(data, codec, rle):
+    if codec == "zlib":
+        data = zlib.decompress(data)
+    elif codec == "lzma":
+        data = lzma.decompress(data)
+    if rle:
+        data = rle_decode(data)
+    return data
+
+
+def _iter_blocks(chunks, block_size):
+    """Re-cut a stream of str/bytes chunks into blocks of exactly block_size bytes"""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk.encode("ascii") if isinstance(chunk, str) else chunk
+        while len(buffer) >= block_size:
+            yield bytes(buffer[:block_size])
+            del buffer[:block_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def write_lsystem_file(file_path, chunks, config=None, iterations=None, seed=None,
+                       codec="zlib", rle=True, block_size=1 << 20, bracket_index=None):
+    """Write an expanded L-system, given as an iterable of chunks, to the binary format.
+
+    chunks can come straight from lsys_stream.iter_l_system_chunks so the
+    full string never exists in memory. Returns the header that was stored.
+    bracket_index defaults to storing the index unless codec is "none":
+    uncompressed it takes more room than the text, and LSystemFile finds
+    the pairs from the symbols instead.
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec {codec!r}, expected one of {CODECS}")
+    if bracket_index is None:
+        bracket_index = codec != "none"
+    counts = np.zeros(256, dtype=np.int64)
+    blocks = []
+    bracket_parts = []
+    depth = 0
+    length = 0
+    with open(file_path, "wb") as file:
+        file.write(MAGIC)
+        for block in _iter_blocks(chunks, block_size):
+            data = np.frombuffer(block, dtype=np.uint8)
+            counts += np.bincount(data, minlength=256)
+            if bracket_index:
+                positions, is_open, levels, depth = lsys_brackets.bracket_levels(data, depth)
+                bracket_parts.append((positions + length, is_open, levels))
+            encoded = _encode_block(block, codec, rle)
+            blocks.append((length, file.tell(), len(encoded)))
+            file.write(encoded)
+            length += len(block)
+        if counts[128:].any():
+            raise ValueError("L-system symbols must be ASCII")
+
+        pairs = np.empty((0, 2), dtype=np.int64)
+        if bracket_index and bracket_parts:
+            if depth != 0:
+                raise ValueError(f"Unbalanced brackets: {depth} '[' left open, write with bracket_index=False")
+            pairs = lsys_brackets.match_brackets(*(np.concatenate(part) for part in zip(*bracket_parts)))
+        bracket_dtype = "<u4" if length < 1 << 32 else "<i8"
+
+        header = {
+            "config": config,
+            "iterations": iterations,
+            "seed": seed,
+            "length": length,
+            "counts": {chr(i): int(n) for i, n in enumerate(counts) if n},
+            "codec": codec,
+            "rle": rle,
+            "block_size": block_size,
+            "bracket_index": bracket_index,
+            "bracket_dtype": bracket_dtype,
+            "bracket_encoding": "delta",
+        }
+        header_offset = file.tell()
+        file.write(json.dumps(header).encode("utf-8"))
+        table_offset = file.tell()
+        file.write(np.asarray(blocks, dtype=np.uint64).reshape(-1, 3).tobytes())
+        index_offset = file.tell()
+        # Gaps and spans are small numbers, which the codec packs far better than positions
+        deltas = np.concatenate([np.diff(pairs[:, 0], prepend=0), pairs[:, 1] - pairs[:, 0]])
+        if len(pairs):
+            file.write(_encode_block(deltas.astype(bracket_dtype).tobytes(), codec, False))
+        file.write(TRAILER.pack(header_offset, table_offset - header_offset, table_offset, len(blocks),
+                                index_offset, len(pairs), MAGIC))
+    return header
+
+
+def is_lsystem_file(file_path):
+    with open(file_path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+class LSystemFile:
+    """Memory-mapped reader for files written by write_lsystem_file.
+
+    Nothing is decoded up front: the block table is a NumPy view on the
+    mapping, blocks are decoded as they are read and the bracket index on
+    first use. Files written without the index scan their symbols for it
+    instead.
+    Uncompressed files without RLE hand out memoryviews of the mapping
+    itself, which must be released before close().
+    """
+
+    def __init__(self, file_path):
+        self.file = open(file_path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC or self.map[-len(MAGIC):] != MAGIC:
+            self.close()
+            raise ValueError(f"{file_path} is not an L-system binary file")
+        (header_offset, header_size, table_offset, n_blocks,
+         index_offset, n_pairs, _) = TRAILER.unpack_from(self.map, len(self.map) - TRAILER.size)
+        self.header = json.loads(self.map[header_offset:header_offset + header_size])
+        self.blocks = np.frombuffer(self.map, dtype=np.uint64, count=n_blocks * 3, offset=table_offset).reshape(-1, 3)
+        self._index = (index_offset, n_pairs, len(self.map) - TRAILER.size)
+        self._brackets = None
+        self.length = self.header["length"]
+        self._raw = self.header["codec"] == "none" and not self.header["rle"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.length
+
+    def close(self):
+        if self.map is not None:
+            # The NumPy views export the mapping's buffer and would block closing it
+            self.blocks = self._brackets = None
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    @property
+    def brackets(self):
+        """(n_pairs, 2) [open, close] position of every bracket pair, in order of '['"""
+        if self._brackets is None:
+            index_offset, n_pairs, index_end = self._index
+            dtype = self.header["bracket_dtype"]
+            if not self.header.get("bracket_index", True):
+                self._brackets = self._scan_brackets()
+            elif n_pairs == 0:
+                self._brackets = np.empty((0, 2), dtype=dtype)
+            else:
+                data = _decode_block(self.map[index_offset:index_end], self.header["codec"], False)
+                gaps, spans = np.frombuffer(data, dtype=dtype).astype(np.int64).reshape(2, n_pairs)
+                opens = np.cumsum(gaps)
+                self._brackets = np.stack([opens, opens + spans], axis=1)
+        return self._brackets
+
+    def _scan_brackets(self):
+        depth = 0
+        parts = []
+        for (start, _, _), chunk in zip(self.blocks.tolist(), self.iter_chunks()):
+            positions, is_open, levels, depth = lsys_brackets.bracket_levels(np.frombuffer(chunk, dtype=np.uint8),
+                                                                             depth)
+            parts.append((positions + start, is_open, levels))
+            # Raw blocks are views of the mapping and must not outlive this loop
+            chunk = None
+        if depth != 0:
+            raise ValueError(f"Unbalanced brackets: {depth} '[' left open")
+        if not parts:
+            return np.empty((0, 2), dtype=np.int64)
+        return lsys_brackets.match_brackets(*(np.concatenate(part) for part in zip(*parts)))
+
+    def block(self, i):
+        """Return the decoded symbols of block i"""
+        _, offset, size = (int(v) for v in self.blocks[i])
+        if self._raw:
+            return memoryview(self.map)[offset:offset + size]
+        return _decode_block(self.map[offset:offset + size], self.header["codec"], self.header["rle"])
+
+    def iter_chunks(self):
+        """Yield the symbols block by block as bytes-like objects"""
+        for i in range(len(self.blocks)):
+            yield self.block(i)
+
+    def iter_text_chunks(self):
+        """Yield the symbols block by block as str, for the turtle interpreters"""
+        for chunk in self.iter_chunks():
+            yield str(chunk, "ascii")
+
+    def read(self, start=0, stop=None):
+        """Return symbols[start:stop] as bytes, decoding only the blocks it overlaps"""
+        stop = self.length if stop is None else min(stop, self.length)
+        if start >= stop:
+            return b""
+        first = int(np.searchsorted(self.blocks[:, 0], start, side="right")) - 1
+        parts = []
+        i = first
+        while i < len(self.blocks) and int(self.blocks[i, 0]) < stop:
+            block_start = int(self.blocks[i, 0])
+            data = self.block(i)
+            parts.append(bytes(data[max(start - block_start, 0):stop - block_start]))
+            i += 1
+        return b"".join(parts)
+
+    def branch(self, i):
+        """Return bracket pair i (in order of its '['), brackets included"""
+        open_pos, close_pos = (int(v) for v in self.brackets[i])
+        return self.read(open_pos, close_pos + 1)
+
+    def enclosing_branch(self, position):
+        """Return the index of the innermost bracket pair containing position, or None"""
+        # Pairs are ordered by '[', so candidates are the pairs opened at or before position
+        candidates = int(np.searchsorted(self.brackets[:, 0], position, side="right"))
+        inside = np.flatnonzero(self.brackets[:candidates, 1] >= position)
+        return int(inside[-1]) if len(inside) else None
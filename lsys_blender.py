@@ -0,0 +1,164 @@
+import bpy
+import numpy as np
+
+import lsys_branching
+import lsys_instances
+import lsys_mesh
+
+
+def mesh_from_arrays(name, mesh_arrays):
+    """Create a Blender mesh from lsys_mesh.MeshArrays with one foreach_set per attribute"""
+    vertices, faces, face_sizes = mesh_arrays
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set("co", np.ascontiguousarray(vertices, dtype=np.float32).ravel())
+    mesh.loops.add(len(faces))
+    mesh.loops.foreach_set("vertex_index", np.ascontiguousarray(faces, dtype=np.int32))
+    mesh.polygons.add(len(face_sizes))
+    loop_start = np.cumsum(face_sizes, dtype=np.int32) - face_sizes
+    mesh.polygons.foreach_set("loop_start", loop_start.astype(np.int32))
+    # Blender 4.0 derives loop_total from loop_start and made it read-only
+    if not mesh.polygons.bl_rna.properties["loop_total"].is_readonly:
+        mesh.polygons.foreach_set("loop_total", np.ascontiguousarray(face_sizes, dtype=np.int32))
+    mesh.update(calc_edges=True)
+    return mesh
+
+
+def object_from_arrays(name, mesh_arrays, collection):
+    """Create a mesh object from MeshArrays and link it to collection"""
+    obj = bpy.data.objects.new(name, mesh_from_arrays(name, mesh_arrays))
+    collection.objects.link(obj)
+    return obj
+
+
+def lod_objects(name, lods, collection):
+    """One object per level of lsys_lod.build_lods, named name_LOD0 and so on.
+
+    Branches and leaf cards of a level share the object; only the finest
+    level is left visible.
+    """
+    objects = []
+    for i, lod in enumerate(lods):
+        obj = object_from_arrays(f"{name}_{lod.level.name}", lsys_mesh.merge_meshes([lod.branches, lod.cards]),
+                                 collection)
+        obj.hide_viewport = obj.hide_render = i > 0
+        objects.append(obj)
+    return objects
+
+
+def linked_copies(objects, angles, collection):
+    """Add a copy of every object per angle, rotated about Z, sharing the original mesh data.
+
+    Copies are new objects only: meshes and modifiers are linked, not
+    duplicated, so the cost does not depend on the size of the tree.
+    """
+    copies = []
+    for angle in angles:
+        for obj in objects:
+            copy = obj.copy()
+            copy.rotation_euler.z += angle
+            collection.objects.link(copy)
+            copies.append(copy)
+    return copies
+
+
+def curve_from_branches(name, branches, collection, bevel_depth=0.02, bevel_resolution=2):
+    """Create a bevelled Bezier curve object with one spline per branch of lsys_branching.Branches.
+
+    Control points, handles and radii go in with one foreach_set each per
+    spline instead of one RNA write per point attribute. New points have
+    FREE handles, so they are set to where AUTO handles would put them.
+    """
+    points = np.asarray(branches.points, dtype=float)
+    left, right = lsys_branching.auto_handles(points)
+    # Rows of 3 control points * 3 coordinates per spline
+    co = points.astype(np.float32).reshape(len(points), -1)
+    left = left.astype(np.float32).reshape(len(points), -1)
+    right = right.astype(np.float32).reshape(len(points), -1)
+    radius = np.ascontiguousarray(branches.radius, dtype=np.float32)
+
+    curve = bpy.data.curves.new(name, 'CURVE')
+    curve.dimensions = '3D'
+    curve.resolution_u = 2
+    splines = curve.splines
+    for i in range(len(points)):
+        bezier_points = splines.new('BEZIER').bezier_points
+        bezier_points.add(points.shape[1] - 1)
+        bezier_points.foreach_set("co", co[i])
+        bezier_points.foreach_set("handle_left", left[i])
+        bezier_points.foreach_set("handle_right", right[i])
+        bezier_points.foreach_set("radius", radius[i])
+    curve.bevel_depth = bevel_depth
+    curve.bevel_resolution = bevel_resolution
+    curve.fill_mode = 'FULL'
+
+    obj = bpy.data.objects.new(name, curve)
+    collection.objects.link(obj)
+    return obj
+
+
+def _new_group_socket(tree, name, in_out, socket_type):
+    # Blender 4.0 replaced tree.inputs / tree.outputs with tree.interface
+    if hasattr(tree, "interface"):
+        return tree.interface.new_socket(name=name, in_out=in_out, socket_type=socket_type)
+    sockets = tree.inputs if in_out == 'INPUT' else tree.outputs
+    return sockets.new(socket_type, name)
+
+
+def instance_node_group(name, instance_obj):
+    """Geometry-nodes group placing instance_obj on every point.
+
+    Rotation and scale come from the 'instance_rotation' (Euler) and
+    'instance_scale' point attributes.
+    """
+    tree = bpy.data.node_groups.new(name, 'GeometryNodeTree')
+    _new_group_socket(tree, "Geometry", 'INPUT', 'NodeSocketGeometry')
+    _new_group_socket(tree, "Geometry", 'OUTPUT', 'NodeSocketGeometry')
+    nodes = tree.nodes
+    links = tree.links
+    group_in = nodes.new('NodeGroupInput')
+    group_out = nodes.new('NodeGroupOutput')
+
+    object_info = nodes.new('GeometryNodeObjectInfo')
+    object_info.inputs["Object"].default_value = instance_obj
+    if "As Instance" in object_info.inputs:
+        object_info.inputs["As Instance"].default_value = True
+
+    rotation = nodes.new('GeometryNodeInputNamedAttribute')
+    rotation.data_type = 'FLOAT_VECTOR'
+    rotation.inputs["Name"].default_value = "instance_rotation"
+    scale = nodes.new('GeometryNodeInputNamedAttribute')
+    scale.data_type = 'FLOAT_VECTOR'
+    scale.inputs["Name"].default_value = "instance_scale"
+
+    on_points = nodes.new('GeometryNodeInstanceOnPoints')
+    links.new(group_in.outputs[0], on_points.inputs["Points"])
+    links.new(object_info.outputs["Geometry"], on_points.inputs["Instance"])
+    links.new(rotation.outputs["Attribute"], on_points.inputs["Rotation"])
+    links.new(scale.outputs["Attribute"], on_points.inputs["Scale"])
+    links.new(on_points.outputs["Instances"], group_out.inputs[0])
+    return tree
+
+
+def instancer_from_arrays(name, instances, instance_obj, collection):
+    """Realize lsys_instances.Instances as one instancing point cloud.
+
+    The points carry the transforms as attributes and an instance-on-points
+    modifier places instance_obj on them, so the .blend holds one object
+    however many instances there are.
+    """
+    position, rotation, scale = instances
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(position))
+    mesh.vertices.foreach_set("co", np.ascontiguousarray(position, dtype=np.float32).ravel())
+    euler = lsys_instances.quaternions_to_euler(rotation)
+    for attribute_name, values in (("instance_rotation", euler), ("instance_scale", scale)):
+        attribute = mesh.attributes.new(attribute_name, 'FLOAT_VECTOR', 'POINT')
+        attribute.data.foreach_set("vector", np.ascontiguousarray(values, dtype=np.float32).ravel())
+    mesh.update()
+
+    obj = bpy.data.objects.new(name, mesh)
+    modifier = obj.modifiers.new(name, 'NODES')
+    modifier.node_group = instance_node_group(name, instance_obj)
+    collection.objects.link(obj)
+    return obj
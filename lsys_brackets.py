@@ -0,0 +1,57 @@
+import numpy as np
+
+OPEN = ord("[")
+CLOSE = ord("]")
+
+
+def as_symbol_array(symbols):
+    """View a str / bytes / bytearray / memoryview of ASCII symbols as a uint8 array"""
+    if isinstance(symbols, str):
+        symbols = symbols.encode("ascii")
+    return np.frombuffer(symbols, dtype=np.uint8)
+
+
+def bracket_levels(data, depth_offset=0):
+    """Find the brackets of a uint8 symbol array and the nesting level each one belongs to.
+
+    Returns (positions, is_open, levels, final depth). The depth after every
+    bracket is a single cumulative sum; an opening bracket belongs to the
+    depth it enters and a closing bracket to the depth it leaves, so a pair
+    shares one level.
+    """
+    positions = np.flatnonzero((data == OPEN) | (data == CLOSE))
+    is_open = data[positions] == OPEN
+    depth = depth_offset + np.cumsum(np.where(is_open, 1, -1))
+    levels = np.where(is_open, depth, depth + 1)
+    final_depth = int(depth[-1]) if len(depth) else depth_offset
+    if len(depth) and depth.min() < 0:
+        raise ValueError("Unbalanced brackets: ']' without a matching '['")
+    return positions, is_open, levels, final_depth
+
+
+def match_brackets(positions, is_open, levels):
+    """Pair brackets found by bracket_levels into an (n, 2) array of [open, close] positions.
+
+    Within one level opening and closing brackets strictly alternate, so a
+    stable sort by level lines every '[' up with its ']'. Pairs are returned
+    in order of their opening bracket.
+    """
+    opens = positions[is_open]
+    closes = positions[~is_open]
+    if len(opens) != len(closes):
+        raise ValueError(f"Unbalanced brackets: {len(opens)} '[' against {len(closes)} ']'")
+    open_order = np.argsort(levels[is_open], kind="stable")
+    close_order = np.argsort(levels[~is_open], kind="stable")
+    pairs = np.empty((len(opens), 2), dtype=np.int64)
+    pairs[open_order, 0] = opens[open_order]
+    pairs[open_order, 1] = closes[close_order]
+    return pairs
+
+
+def bracket_pairs(symbols):
+    """Return the [open, close] position of every bracket pair of an L-system string"""
+    data = as_symbol_array(symbols)
+    positions, is_open, levels, final_depth = bracket_levels(data)
+    if final_depth != 0:
+        raise ValueError(f"Unbalanced brackets: {final_depth} '[' left open")
+    return match_brackets(positions, is_open, levels)
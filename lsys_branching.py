@@ -0,0 +1,327 @@
+import math
+from collections import namedtuple
+
+import numpy as np
+
+# Branches of the bendy tree model, breadth first, so every level is one
+# contiguous index range and parents come before their children:
+# points: (N, 3, 3) start, bent middle and end control point of every branch
+# radius: (N, 3) radius at those points
+# depth:  (N,) int32 branching level, 0 for the trunk
+# parent: (N,) int64 index of the branch it grows from, -1 for the trunk
+# key:    (N,) uint64 random key of the branch, see branch_key
+Branches = namedtuple("Branches", ["points", "radius", "depth", "parent", "key"])
+
+_BEND_AXES = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+_SPREAD_AXES = np.array([[0.0, 0.0, 1.0], [0.0, 1.0, 0.0], [1.0, 0.0, 0.0]])
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_DRAW_SALT = np.uint64(0x5851F42D4C957F2D)
+# Draws per branch, by column: length jitter, bend angle, bend axis, middle
+# offset x, y and z, child count, spread angle and spread axis, then a
+# spread angle and axis for every redirect of a crowded branch
+_DRAWS = 9
+_REDIRECTS = 3
+_CELL_BITS = 21
+
+
+def _mix(x):
+    # SplitMix64 finalizer: a bijection of 64-bit words in which every input bit affects every output bit
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def child_keys(keys, sibling):
+    """Keys of children number sibling (0, 1, ...) of branches with the given keys"""
+    return _mix(np.asarray(keys, dtype=np.uint64) + (np.asarray(sibling, dtype=np.uint64) + np.uint64(1)) * _GOLDEN)
+
+
+def branch_key(seed, path=()):
+    """Key of the branch reached from the trunk of tree seed by taking child path[0], then path[1] and so on.
+
+    The key is all the randomness of a branch: its draws are a pure
+    function of it (branch_uniforms), and its children's keys are hashes
+    of it and their sibling number.
+    """
+    keys = _mix(np.array([seed], dtype=np.uint64))
+    for sibling in path:
+        keys = child_keys(keys, [sibling])
+    return keys[0]
+
+
+def branch_uniforms(keys, count=_DRAWS):
+    """(N, count) uniform draws in [0, 1) of every branch, computed from its key alone.
+
+    A counter-based generator: draw j is a hash of (key, j), so any branch
+    can be regenerated without replaying the draws of the rest of the tree,
+    in any order and in any process.
+    """
+    counters = np.arange(1, count + 1, dtype=np.uint64) * _GOLDEN
+    bits = _mix((np.asarray(keys, dtype=np.uint64)[:, None] ^ _DRAW_SALT) + counters[None, :])
+    # The top 53 bits fill a double's mantissa
+    return (bits >> np.uint64(11)) * 2.0 ** -53
+
+
+def rotate_vectors(vectors, axes, angles):
+    """Rotate (N, 3) vectors about (N, 3) unit axes by (N,) angles, Rodrigues' formula in one batch"""
+    cos = np.cos(angles)[:, None]
+    sin = np.sin(angles)[:, None]
+    dot = np.einsum("ij,ij->i", axes, vectors)[:, None]
+    return vectors * cos + np.cross(axes, vectors) * sin + axes * (dot * (1 - cos))
+
+
+def _normalize(vectors):
+    length = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(length == 0, 1.0, length)
+
+
+class SpatialHash:
+    """Uniform grid over 3D points for fixed-radius neighbour queries, kept in NumPy arrays.
+
+    Points are bucketed into cubes of cell_size and stored sorted by cell,
+    with the first point of every occupied cell, so a query is a
+    searchsorted over the cells overlapping its cube: 8 when the radius is
+    at most half the cell size, 27 up to the cell size. Cells far apart
+    can share a key, which only adds candidates as distances are always
+    checked. insert() re-sorts all points; grow_branches inserts once per
+    level, and every level has at least as many branches as all earlier
+    ones together, so this stays amortized O(1) per point.
+    """
+
+    def __init__(self, cell_size):
+        if cell_size <= 0:
+            raise ValueError(f"Cell size must be positive, got {cell_size}")
+        self.cell_size = float(cell_size)
+        self.points = np.empty((0, 3))
+        self.owner = np.empty(0, dtype=np.int64)
+        self._cells = np.empty(0, dtype=np.int64)
+        self._starts = np.zeros(1, dtype=np.int64)
+
+    def _keys(self, cells):
+        mask = (1 << _CELL_BITS) - 1
+        return ((cells[:, 0] & mask) << (2 * _CELL_BITS)) | ((cells[:, 1] & mask) << _CELL_BITS) | (cells[:, 2] & mask)
+
+    def insert(self, points, owner):
+        """Add (N, 3) points, each tagged with an owner id such as its branch index"""
+        points = np.concatenate([self.points, np.asarray(points, dtype=float).reshape(-1, 3)])
+        owner = np.concatenate([self.owner, np.asarray(owner, dtype=np.int64)])
+        keys = self._keys(np.floor(points / self.cell_size).astype(np.int64))
+        order = np.argsort(keys, kind="stable")
+        self.points = points[order]
+        self.owner = owner[order]
+        self._cells, first = np.unique(keys[order], return_index=True)
+        self._starts = np.append(first, len(keys))
+
+    def neighbours(self, points, radius):
+        """(query, index, distance) of every indexed point closer than radius to a query point.
+
+        index refers to self.points and self.owner.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        empty = np.empty(0, dtype=np.int64)
+        if len(self._cells) == 0 or len(points) == 0:
+            return empty, empty, np.empty(0)
+        # The cells overlapping the cube around each query point, from its lowest corner on
+        steps = np.arange(int(math.ceil(2 * radius / self.cell_size)) + 1)
+        offsets = np.stack(np.meshgrid(steps, steps, steps, indexing="ij"), axis=-1).reshape(-1, 3)
+        cells = np.floor((points - radius) / self.cell_size).astype(np.int64)
+        keys = self._keys((cells[:, None, :] + offsets[None]).reshape(-1, 3))
+        slot = np.minimum(np.searchsorted(self._cells, keys), len(self._cells) - 1)
+        found = self._cells[slot] == keys
+        query = np.repeat(np.arange(len(points)), len(offsets))[found]
+        slot = slot[found]
+        counts = self._starts[slot + 1] - self._starts[slot]
+        query = np.repeat(query, counts)
+        index = np.repeat(self._starts[slot] - (np.cumsum(counts) - counts), counts) + np.arange(len(query))
+        distance = np.linalg.norm(self.points[index] - points[query], axis=1)
+        close = distance < radius
+        return query[close], index[close], distance[close]
+
+
+def _spread(heading, u, column, spread):
+    # Turn off the parent direction by draw `column` (angle) about the axis picked by draw column + 1
+    axes = _SPREAD_AXES[(u[:, column + 1] * 3).astype(np.intp)]
+    return _normalize(rotate_vectors(heading, axes, spread * (2 * u[:, column] - 1)))
+
+
+def _shape(start, direction, length, bend_axes, bend, offset):
+    bent = _normalize(rotate_vectors(direction, bend_axes, bend))
+    end = start + length[:, None] * bent
+    middle = (start + end) / 2 + offset
+    return bent, middle, end
+
+
+def _samples(middle, end):
+    # Points checked for crowding: the outer half of the branch, where it leaves the fork
+    return np.stack([middle, (middle + end) / 2, end], axis=1)
+
+
+def _open_space(grid, probes, exclude, reach):
+    """Push of every probe away from indexed points within reach, fading linearly with distance"""
+    query, index, distance = grid.neighbours(probes, reach)
+    keep = (grid.owner[index] != exclude[query]) & (distance > 0)
+    query, index, distance = query[keep], index[keep], distance[keep]
+    weight = (1 - distance / reach) / distance
+    away = (probes[query] - grid.points[index]) * weight[:, None]
+    return np.stack([np.bincount(query, away[:, k], len(probes)) for k in range(3)], axis=1)
+
+
+def _crowded(grid, samples, exclude, clearance):
+    """Mask of branches with a sample closer than clearance to an indexed point not owned by exclude"""
+    n, per_branch = samples.shape[:2]
+    query, index, _ = grid.neighbours(samples.reshape(-1, 3), clearance)
+    branch = query // per_branch
+    hit = grid.owner[index] != exclude[branch]
+    return np.bincount(branch[hit], minlength=n) > 0
+
+
+def grow_branches(branch_count=4, max_height=6, trunk_thickness=0.2, thickness_reduction=0.7, branch_length=1.0,
+                  branch_length_reduction=1.0, length_jitter=(0.7, 1.0), max_angle=50.0, spread_with_depth=False,
+                  seed=0, subtree=(), clearance=0.0, open_space=0.0):
+    """Grow the bendy branching tree of create_connected_low_poly_tree as arrays, without Blender.
+
+    Over branch_count levels, every branch splits into branch_count - 1
+    (70%) or branch_count (30%) bent children turned up to max_angle
+    degrees; spread_with_depth widens that angle with the level. Lengths
+    start at branch_length * max_height / branch_count, shrink by
+    branch_length_reduction per level and are scaled by a draw from
+    length_jitter. A level is grown in one batch of NumPy draws and rotations.
+
+    seed: every branch draws from a key of seed and its path from the trunk,
+        so a seed always gives the same tree
+    subtree: such a path; only that branch and its descendants are grown
+    clearance: redirect, then drop, new branches coming closer than this
+        to other branches; needs the whole tree, so no subtree
+    open_space: bend new branches away from crowded space by this much
+    Returns Branches.
+    """
+    if branch_count < 1:
+        raise ValueError(f"branch_count must be at least 1, got {branch_count}")
+    subtree = tuple(subtree)
+    if len(subtree) >= branch_count:
+        raise ValueError(f"Subtree path {subtree} is deeper than the {branch_count} levels of the tree")
+    if subtree and clearance:
+        raise ValueError("A subtree can only be regrown on its own without clearance")
+    # Cells of twice the clearance: 8 per crowding query and 27 per open space query
+    grid = SpatialHash(2 * clearance) if clearance else None
+    unit_length = branch_length * max_height / branch_count
+    levels = []
+    # The branches of the current level: key, parent index, start point and parent direction
+    keys = _mix(np.array([seed], dtype=np.uint64))
+    parent = np.array([-1], dtype=np.int64)
+    start = np.zeros((1, 3))
+    heading = np.array([[0.0, 0.0, 1.0]])
+    first = 0
+    thickness = trunk_thickness
+    for d in range(branch_count):
+        n = len(keys)
+        u = branch_uniforms(keys, _DRAWS + 2 * _REDIRECTS if grid is not None else _DRAWS)
+        # Children turn off their parent's direction, with the spread of the parent's level
+        spread = math.radians(max_angle) * ((d + 3) / branch_count if spread_with_depth else 1.0)
+        direction = _spread(heading, u, 7, spread) if d > 0 else heading
+        low, high = length_jitter
+        length = unit_length * branch_length_reduction ** d * (low + (high - low) * u[:, 0])
+        bend_axes = _BEND_AXES[(u[:, 2] * 2).astype(np.intp)]
+        bend = 0.3 * (2 * u[:, 1] - 1)
+        offset = 0.2 * (2 * u[:, 3:6] - 1)
+
+        if grid is not None and d > 0:
+            alive = np.zeros(n, dtype=bool)
+            pending = np.arange(n)
+            # Branches of this level placed so far; crowding among them is checked as well
+            placed = SpatialHash(2 * clearance)
+            for attempt in range(_REDIRECTS + 1):
+                if attempt:
+                    direction[pending] = _spread(heading[pending], u[pending], _DRAWS + 2 * (attempt - 1), spread)
+                if open_space:
+                    tip = start[pending] + length[pending, None] * direction[pending]
+                    push = _open_space(grid, tip, parent[pending], 2 * clearance)
+                    direction[pending] = _normalize(direction[pending] + open_space * push)
+                _, middle, end = _shape(start[pending], direction[pending], length[pending], bend_axes[pending],
+                                        bend[pending], offset[pending])
+                samples = _samples(middle, end)
+                crowded = _crowded(grid, samples, parent[pending], clearance)
+                crowded |= _crowded(placed, samples, np.full(len(pending), -1), clearance)
+                # Of two new branches crowding each other, the later one tries again
+                batch = SpatialHash(2 * clearance)
+                batch.insert(samples.reshape(-1, 3), np.repeat(np.arange(len(pending)), samples.shape[1]))
+                query, index, _ = batch.neighbours(samples.reshape(-1, 3), clearance)
+                later = query // samples.shape[1]
+                earlier = batch.owner[index]
+                conflict = (earlier < later) & ~crowded[earlier]
+                crowded[later[conflict]] = True
+
+                fits = ~crowded
+                alive[pending[fits]] = True
+                placed.insert(samples[fits].reshape(-1, 3), np.repeat(pending[fits], samples.shape[1]))
+                pending = pending[crowded]
+                if len(pending) == 0:
+                    break
+
+            keys, parent, start, direction = keys[alive], parent[alive], start[alive], direction[alive]
+            length, bend_axes, bend, offset, u = length[alive], bend_axes[alive], bend[alive], offset[alive], u[alive]
+            n = len(keys)
+
+        bent, middle, end = _shape(start, direction, length, bend_axes, bend, offset)
+        children = np.where(u[:, 6] < 0.7, branch_count - 1, branch_count)
+        if grid is not None:
+            grid.insert(_samples(middle, end).reshape(-1, 3), np.repeat(np.arange(first, first + n), 3))
+
+        if d < len(subtree):
+            # Still walking down to the subtree: follow only the branch on its path
+            if not 0 <= subtree[d] < children[0]:
+                raise ValueError(f"Branch {subtree[:d]} has no child {subtree[d]}")
+            source = np.zeros(1, dtype=np.intp)
+            sibling = np.array([subtree[d]])
+            parent = np.array([-1], dtype=np.int64)
+        else:
+            radius = np.tile([thickness, thickness * (1 + thickness_reduction) / 2, thickness * thickness_reduction],
+                             (n, 1))
+            levels.append((np.stack([start, middle, end], axis=1), radius, np.full(n, d, dtype=np.int32), parent,
+                           keys))
+            source = np.repeat(np.arange(n), children)
+            sibling = np.arange(len(source)) - np.repeat(np.cumsum(children) - children, children)
+            parent = source + first
+            first += n
+        keys = child_keys(keys[source], sibling)
+        start = end[source]
+        heading = bent[source]
+        thickness *= thickness_reduction
+    return Branches(*(np.concatenate(arrays) for arrays in zip(*levels)))
+
+
+def auto_handles(points):
+    """Left and right handles of (N, P, 3) Bezier control points, as Blender's AUTO handle type sets them.
+
+    Handles follow the sum of the unit directions to both neighbours, each
+    scaled by its own neighbour distance / 2.5614. End points mirror their
+    only neighbour. With the handles known, a curve can be written with
+    foreach_set and FREE handles and still look like the AUTO one.
+    """
+    points = np.asarray(points, dtype=float)
+    previous = np.concatenate([2 * points[:, :1] - points[:, 1:2], points[:, :-1]], axis=1)
+    following = np.concatenate([points[:, 1:], 2 * points[:, -1:] - points[:, -2:-1]], axis=1)
+    before = points - previous
+    after = following - points
+    length_before = np.linalg.norm(before, axis=2, keepdims=True)
+    length_after = np.linalg.norm(after, axis=2, keepdims=True)
+    length_before[length_before == 0] = 1.0
+    length_after[length_after == 0] = 1.0
+    tangent = before / length_before + after / length_after
+    scale = np.linalg.norm(tangent, axis=2, keepdims=True) * 2.5614
+    scale[scale == 0] = np.inf
+    return points - tangent * (length_before / scale), points + tangent * (length_after / scale)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    # Time the generator alone for increasing depths, without Blender
+    for branch_count in range(4, int(sys.argv[1]) + 1 if len(sys.argv) > 1 else 8):
+        started = time.perf_counter()
+        branches = grow_branches(branch_count, max_height=7, trunk_thickness=5, thickness_reduction=0.6, seed=1)
+        print(f"branch_count={branch_count}: {len(branches.parent):,} branches in {time.perf_counter() - started:.3f}s")
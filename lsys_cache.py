@@ -0,0 +1,121 @@
+from collections import OrderedDict, namedtuple
+
+
+class ExpansionCache:
+    """LRU cache of (symbol, remaining depth) -> expanded string for deterministic rules.
+
+    The cache is bounded by the total number of symbols it holds; the least
+    recently used expansions are evicted first and expansions longer than
+    the bound are returned without being stored.
+    """
+
+    def __init__(self, rules, max_symbols=1 << 24):
+        for symbol, successor in rules.items():
+            if isinstance(successor, list):
+                raise ValueError(f"Rule for {symbol!r} is stochastic, expansions cannot be shared")
+        self.rules = dict(rules)
+        self.max_symbols = max_symbols
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def expand(self, symbol, depth):
+        """Return the expansion of symbol after depth generations"""
+        if depth == 0 or symbol not in self.rules:
+            return symbol
+        key = (symbol, depth)
+        expansion = self.entries.get(key)
+        if expansion is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return expansion
+        self.misses += 1
+        expansion = self.expand_string(self.rules[symbol], depth - 1)
+        self._store(key, expansion)
+        return expansion
+
+    def expand_string(self, string, depth):
+        """Return the expansion of every symbol of string after depth generations"""
+        return "".join([self.expand(char, depth) for char in string])
+
+    def _store(self, key, expansion):
+        if len(expansion) > self.max_symbols:
+            return
+        self.entries[key] = expansion
+        self.size += len(expansion)
+        while self.size > self.max_symbols:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+# One shared node per distinct (symbol, depth): children are the nodes of the
+# successor's symbols one generation further down, length is the expanded size.
+ExpansionNode = namedtuple("ExpansionNode", ["symbol", "depth", "children", "length"])
+
+
+def build_expansion_dag(axiom, rules, iterations):
+    """Build the expansion of axiom as a DAG in which identical subtrees are one node.
+
+    Returns the root nodes (one per axiom symbol) and the table of every
+    distinct node keyed by (symbol, depth); symbols without a rule always
+    have depth 0. Nodes share children, so compare and hash them by that key
+    rather than by value. Only O(alphabet * iterations) nodes exist however
+    long the expanded string is.
+    """
+    nodes = {}
+
+    def node_for(symbol, depth):
+        if symbol not in rules:
+            depth = 0
+        key = (symbol, depth)
+        node = nodes.get(key)
+        if node is None:
+            if depth == 0:
+                node = ExpansionNode(symbol, 0, (), 1)
+            else:
+                if isinstance(rules[symbol], list):
+                    raise ValueError(f"Rule for {symbol!r} is stochastic, expansions cannot be shared")
+                children = tuple(node_for(char, depth - 1) for char in rules[symbol])
+                node = ExpansionNode(symbol, depth, children, sum(child.length for child in children))
+            nodes[key] = node
+        return node
+
+    roots = [node_for(char, iterations) for char in axiom]
+    return roots, nodes
+
+
+def iter_node_symbols(node):
+    """Yield the expanded symbols below a DAG node without materializing the string"""
+    stack = [iter((node,))]
+    while stack:
+        child = next(stack[-1], None)
+        if child is None:
+            stack.pop()
+        elif child.children:
+            stack.append(iter(child.children))
+        else:
+            yield child.symbol
+
+
+def node_instance_counts(roots, nodes):
+    """Count how often each node occurs in the full expansion, keyed like the node table.
+
+    Geometry built once for a node can be instanced that many times, as long
+    as the turtle applies its turns in the local frame so a subtree only
+    depends on its entry transform.
+    """
+    counts = dict.fromkeys(nodes, 0)
+    for root in roots:
+        counts[(root.symbol, root.depth)] += 1
+    # Deeper nodes only ever have shallower children, so walking the table
+    # from the largest depth down pushes every count after it is complete
+    for key in sorted(nodes, key=lambda key: key[1], reverse=True):
+        node = nodes[key]
+        for child in node.children:
+            counts[(child.symbol, child.depth)] += counts[key]
+    return counts
@@ -0,0 +1,14 @@
+import sys
+
+
+def script_args(argv=None):
+    """The command-line arguments of a script that runs both under Python and inside Blender.
+
+    Blender passes a script's own arguments after "--"
+    (blender --background --python lsys_batch.py -- manifest.json out/).
+    It also runs the file without its folder on sys.path. So such scripts
+    append their own folder to sys.path before importing this module or
+    any other lsys_ module.
+    """
+    argv = sys.argv if argv is None else argv
+    return argv[argv.index("--") + 1:] if "--" in argv else argv[1:]
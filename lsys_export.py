@@ -0,0 +1,224 @@
+import json
+import re
+import struct
+
+import numpy as np
+
+import lsys_instances
+import lsys_mesh
+
+# glTF is Y-up while the turtle and Blender are Z-up; the scene root turns
+# -90 degrees about X instead of every vertex being converted
+_Z_UP_TO_Y_UP = [-np.sqrt(0.5), 0.0, 0.0, np.sqrt(0.5)]
+
+_GLB_MAGIC = b"glTF"
+_CHUNK = struct.Struct("<I4s")
+_FLOAT = 5126
+_UNSIGNED_INT = 5125
+_ARRAY_BUFFER = 34962
+_ELEMENT_ARRAY_BUFFER = 34963
+
+
+def triangulate(mesh):
+    """Split every face of MeshArrays into a fan of triangles, returned as (T, 3) int32"""
+    sizes = mesh.face_sizes.astype(np.int64)
+    if len(sizes) == 0:
+        return np.empty((0, 3), dtype=np.int32)
+    first = np.cumsum(sizes) - sizes
+    fans = sizes - 2
+    # Triangle k of a face with corners c0..cn is (c0, c(k+1), c(k+2))
+    face = np.repeat(np.arange(len(sizes)), fans)
+    k = np.arange(len(face)) - np.repeat(np.cumsum(fans) - fans, fans)
+    corners = np.stack([first[face], first[face] + k + 1, first[face] + k + 2], axis=1)
+    return mesh.faces[corners].astype(np.int32)
+
+
+class _GlbBuffer:
+    """Collects the arrays of one binary glTF, written later without copying them"""
+
+    def __init__(self):
+        self.arrays = []
+        self.byte_length = 0
+        self.buffer_views = []
+        self.accessors = []
+
+    def add(self, array, accessor_type, component_type, target=None, bounds=False):
+        array = np.ascontiguousarray(array)
+        offset = self.byte_length
+        self.arrays.append(array)
+        self.byte_length += array.nbytes
+        # Every view starts on a 4-byte boundary
+        padding = -self.byte_length % 4
+        if padding:
+            self.arrays.append(np.zeros(padding, dtype=np.uint8))
+            self.byte_length += padding
+        view = {"buffer": 0, "byteOffset": offset, "byteLength": array.nbytes}
+        if target is not None:
+            view["target"] = target
+        self.buffer_views.append(view)
+        accessor = {
+            "bufferView": len(self.buffer_views) - 1,
+            "componentType": component_type,
+            "count": len(array),
+            "type": accessor_type,
+        }
+        if bounds:
+            accessor["min"] = array.min(axis=0).tolist()
+            accessor["max"] = array.max(axis=0).tolist()
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+    def add_mesh(self, mesh):
+        """Add positions and triangle indices of MeshArrays, returning a glTF mesh primitive"""
+        positions = self.add(np.asarray(mesh.vertices, dtype=np.float32), "VEC3", _FLOAT, _ARRAY_BUFFER, bounds=True)
+        indices = self.add(triangulate(mesh).astype(np.uint32).ravel(), "SCALAR", _UNSIGNED_INT,
+                           _ELEMENT_ARRAY_BUFFER)
+        return {"attributes": {"POSITION": positions}, "indices": indices}
+
+
+def write_glb(file_path, mesh, instances=None, instance_mesh=None, name="LSystemTree"):
+    """Write MeshArrays, plus optional instanced leaves, as a binary glTF (.glb) file.
+
+    instances are lsys_instances.Instances placing instance_mesh (a
+    MeshArrays such as the leaf asset from read_obj) through the
+    EXT_mesh_gpu_instancing extension, so every leaf shares one mesh in
+    the file and on the GPU. Array data is written straight from the NumPy
+    buffers.
+    """
+    buffer = _GlbBuffer()
+    meshes = []
+    children = []
+    nodes = []
+    extensions = []
+    if len(mesh.vertices):
+        meshes.append({"name": f"{name}Branches", "primitives": [buffer.add_mesh(mesh)]})
+        nodes.append({"name": f"{name}Branches", "mesh": len(meshes) - 1})
+        children.append(len(nodes) - 1)
+    if instances is not None and len(instances.position):
+        if instance_mesh is None:
+            raise ValueError("Instances need an instance_mesh to place")
+        position, rotation, scale = instances
+        # glTF stores quaternions as x, y, z, w
+        attributes = {
+            "TRANSLATION": buffer.add(np.asarray(position, dtype=np.float32), "VEC3", _FLOAT),
+            "ROTATION": buffer.add(np.asarray(rotation, dtype=np.float32)[:, [1, 2, 3, 0]], "VEC4", _FLOAT),
+            "SCALE": buffer.add(np.asarray(scale, dtype=np.float32), "VEC3", _FLOAT),
+        }
+        meshes.append({"name": f"{name}Leaf", "primitives": [buffer.add_mesh(instance_mesh)]})
+        nodes.append({
+            "name": f"{name}Leaves",
+            "mesh": len(meshes) - 1,
+            "extensions": {"EXT_mesh_gpu_instancing": {"attributes": attributes}},
+        })
+        children.append(len(nodes) - 1)
+        extensions.append("EXT_mesh_gpu_instancing")
+    root = {"name": name, "rotation": _Z_UP_TO_Y_UP}
+    if children:
+        root["children"] = children
+    nodes.append(root)
+
+    document = {
+        "asset": {"version": "2.0", "generator": "lsys_export"},
+        "scene": 0,
+        "scenes": [{"nodes": [len(nodes) - 1]}],
+        "nodes": nodes,
+    }
+    # glTF forbids empty arrays and zero-length buffers, so an empty tree
+    # is written as just its root node, with no binary chunk
+    if meshes:
+        document["meshes"] = meshes
+        document["accessors"] = buffer.accessors
+        document["bufferViews"] = buffer.buffer_views
+        document["buffers"] = [{"byteLength": buffer.byte_length}]
+    if extensions:
+        # Viewers without the extension would show a single leaf, so require it
+        document["extensionsUsed"] = document["extensionsRequired"] = extensions
+    json_chunk = json.dumps(document, separators=(",", ":")).encode("utf-8")
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    total = 12 + _CHUNK.size + len(json_chunk)
+    if meshes:
+        total += _CHUNK.size + buffer.byte_length
+    with open(file_path, "wb") as file:
+        file.write(struct.pack("<4sII", _GLB_MAGIC, 2, total))
+        file.write(_CHUNK.pack(len(json_chunk), b"JSON"))
+        file.write(json_chunk)
+        if meshes:
+            file.write(_CHUNK.pack(buffer.byte_length, b"BIN\x00"))
+            for array in buffer.arrays:
+                file.write(memoryview(array).cast("B"))
+
+
+def instance_vertices(instances, instance_mesh):
+    """Bake instances into one MeshArrays, for formats without instancing"""
+    position, rotation, scale = instances
+    frames = lsys_instances.quaternions_to_frames(rotation)
+    local = instance_mesh.vertices[None, :, :] * np.asarray(scale)[:, None, :]
+    vertices = np.einsum("nij,nvj->nvi", frames, local) + np.asarray(position)[:, None, :]
+    offsets = (np.arange(len(position)) * len(instance_mesh.vertices))[:, None]
+    return lsys_mesh.MeshArrays(
+        vertices.reshape(-1, 3).astype(np.float32),
+        (instance_mesh.faces[None] + offsets).reshape(-1).astype(np.int32),
+        np.tile(instance_mesh.face_sizes, len(position)),
+    )
+
+
+def _write_rows(file, fmt, rows, chunk_rows=1 << 16):
+    # One %-format over a block of rows is several times faster than np.savetxt
+    for start in range(0, len(rows), chunk_rows):
+        block = rows[start:start + chunk_rows]
+        file.write((fmt * len(block)) % tuple(block.ravel().tolist()))
+
+
+def _write_faces(file, mesh, vertex_offset):
+    sizes = mesh.face_sizes
+    first = np.cumsum(sizes) - sizes
+    # Faces with the same corner count are written together
+    for size in np.unique(sizes):
+        corners = first[sizes == size][:, None] + np.arange(size)
+        _write_rows(file, "f" + " %d" * size + "\n", mesh.faces[corners] + vertex_offset + 1)
+
+
+def write_obj(file_path, mesh, instances=None, instance_mesh=None, name="LSystemTree"):
+    """Write MeshArrays as a Wavefront OBJ; instances are baked in as a second object"""
+    with open(file_path, "w") as file:
+        file.write("# lsys_export\n")
+        parts = [(f"{name}Branches", mesh)]
+        if instances is not None and len(instances.position):
+            if instance_mesh is None:
+                raise ValueError("Instances need an instance_mesh to place")
+            parts.append((f"{name}Leaves", instance_vertices(instances, instance_mesh)))
+        vertex_offset = 0
+        for part_name, part in parts:
+            file.write(f"o {part_name}\n")
+            _write_rows(file, "v %.6f %.6f %.6f\n", part.vertices)
+            _write_faces(file, part, vertex_offset)
+            vertex_offset += len(part.vertices)
+
+
+_OBJ_LINE = re.compile(r"^(v|f)\s+(.*)$", re.M)
+
+
+def read_obj(file_path):
+    """Read the vertices and faces of an OBJ file, such as the leaf asset, as MeshArrays.
+
+    Texture coordinates, normals, groups and materials are ignored.
+    """
+    with open(file_path, "r") as file:
+        text = file.read()
+    vertices = []
+    faces = []
+    face_sizes = []
+    for kind, rest in _OBJ_LINE.findall(text):
+        values = rest.split()
+        if kind == "v":
+            vertices.append([float(value) for value in values[:3]])
+        else:
+            corners = [int(value.split("/")[0]) for value in values]
+            # Negative indices count back from the last vertex read so far
+            faces += [corner - 1 if corner > 0 else len(vertices) + corner for corner in corners]
+            face_sizes.append(len(corners))
+    return lsys_mesh.MeshArrays(
+        np.array(vertices, dtype=np.float32).reshape(-1, 3),
+        np.array(faces, dtype=np.int32),
+        np.array(face_sizes, dtype=np.int32),
+    )
@@ -0,0 +1,96 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Instance transforms, one row per instance:
+# position: (N, 3)
+# rotation: (N, 4) quaternion as w, x, y, z (Blender's order)
+# scale:    (N, 3)
+Instances = namedtuple("Instances", ["position", "rotation", "scale"])
+
+
+def frames_to_quaternions(frames):
+    """Convert (N, 3, 3) rotation matrices to (N, 4) w, x, y, z quaternions"""
+    m = np.asarray(frames, dtype=float)
+    m00, m11, m22 = m[:, 0, 0], m[:, 1, 1], m[:, 2, 2]
+    # Pick the numerically largest of w, x, y, z per row to divide by
+    candidates = np.stack([m00 + m11 + m22, m00, m11, m22], axis=1)
+    case = np.argmax(candidates, axis=1)
+    q = np.empty((len(m), 4))
+
+    rows = case == 0
+    s = np.sqrt(1.0 + candidates[rows, 0]) * 2
+    q[rows] = np.stack([0.25 * s, (m[rows, 2, 1] - m[rows, 1, 2]) / s,
+                        (m[rows, 0, 2] - m[rows, 2, 0]) / s, (m[rows, 1, 0] - m[rows, 0, 1]) / s], axis=1)
+    rows = case == 1
+    s = np.sqrt(1.0 + m00[rows] - m11[rows] - m22[rows]) * 2
+    q[rows] = np.stack([(m[rows, 2, 1] - m[rows, 1, 2]) / s, 0.25 * s,
+                        (m[rows, 0, 1] + m[rows, 1, 0]) / s, (m[rows, 0, 2] + m[rows, 2, 0]) / s], axis=1)
+    rows = case == 2
+    s = np.sqrt(1.0 + m11[rows] - m00[rows] - m22[rows]) * 2
+    q[rows] = np.stack([(m[rows, 0, 2] - m[rows, 2, 0]) / s, (m[rows, 0, 1] + m[rows, 1, 0]) / s,
+                        0.25 * s, (m[rows, 1, 2] + m[rows, 2, 1]) / s], axis=1)
+    rows = case == 3
+    s = np.sqrt(1.0 + m22[rows] - m00[rows] - m11[rows]) * 2
+    q[rows] = np.stack([(m[rows, 1, 0] - m[rows, 0, 1]) / s, (m[rows, 0, 2] + m[rows, 2, 0]) / s,
+                        (m[rows, 1, 2] + m[rows, 2, 1]) / s, 0.25 * s], axis=1)
+    return q
+
+
+def directions_to_quaternions(directions):
+    """Quaternions (N, 4) rotating +Z onto every (N, 3) direction by the shortest arc.
+
+    The arc is q = (1 + z.d, z x d), normalized. For directions in the
+    lower hemisphere 1 + z.d is computed as (x^2 + y^2) / (1 - z) to avoid
+    cancellation, so near-antiparallel directions keep an accurate axis;
+    exactly -Z gets a half turn about X. Zero-length directions map to
+    the identity.
+    """
+    d = np.asarray(directions, dtype=float).reshape(-1, 3)
+    norm = np.linalg.norm(d, axis=1)
+    d = np.divide(d, norm[:, None], out=np.zeros_like(d), where=norm[:, None] > 0)
+    dx, dy, dz = d.T
+    horizontal = dx * dx + dy * dy
+    w = np.where(dz >= 0, 1 + dz, horizontal / np.maximum(1 - dz, 1.0))
+    q = np.stack([w, -dy, dx, np.zeros_like(dz)], axis=1)
+    length = np.linalg.norm(q, axis=1, keepdims=True)
+    antiparallel = length[:, 0] == 0
+    q = np.divide(q, length, out=np.zeros_like(q), where=length > 0)
+    q[antiparallel] = (0.0, 1.0, 0.0, 0.0)
+    q[norm == 0] = (1.0, 0.0, 0.0, 0.0)
+    return q
+
+
+def quaternions_to_frames(quaternions):
+    """Convert (N, 4) w, x, y, z quaternions to (N, 3, 3) rotation matrices"""
+    w, x, y, z = np.asarray(quaternions, dtype=float).reshape(-1, 4).T
+    return np.stack([
+        np.stack([1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)], axis=1),
+        np.stack([2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)], axis=1),
+        np.stack([2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)], axis=1),
+    ], axis=1)
+
+
+def directions_to_frames(directions):
+    """Rotation matrices (N, 3, 3) whose third column is every unit direction, see directions_to_quaternions"""
+    return quaternions_to_frames(directions_to_quaternions(directions))
+
+
+def quaternions_to_euler(quaternions):
+    """Convert (N, 4) w, x, y, z quaternions to (N, 3) Euler angles in Blender's 'XYZ' order"""
+    w, x, y, z = np.asarray(quaternions, dtype=float).T
+    return np.stack([
+        np.arctan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y)),
+        np.arcsin(np.clip(2 * (w * y - z * x), -1.0, 1.0)),
+        np.arctan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z)),
+    ], axis=1)
+
+
+def leaf_instances(segments, leaf_scale=0.125):
+    """One leaf per segment of lsys_turtle.interpret, at its end and pointing along it"""
+    n = len(segments.end)
+    return Instances(
+        position=segments.end.copy(),
+        rotation=directions_to_quaternions(segments.end - segments.start),
+        scale=np.full((n, 3), leaf_scale),
+    )
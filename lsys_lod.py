@@ -0,0 +1,158 @@
+from collections import namedtuple
+
+import numpy as np
+
+import lsys_instances
+import lsys_mesh
+import lsys_turtle
+
+# One level of detail:
+# sides:          ring resolution of the thickest branches
+# min_sides:      ring resolution never drops below this
+# depth_step:     ring resolution halves every depth_step bracket levels, 0 to keep it
+# twig_fraction:  subtrees shorter than this fraction of the tree's height are
+#                 pruned; the tree-relative size stands in for screen size, as a
+#                 level is only shown once the whole tree covers few pixels
+# leaf_cards:     replace every pruned subtree with a pair of crossed quads
+LodLevel = namedtuple("LodLevel", ["name", "sides", "min_sides", "depth_step", "twig_fraction", "leaf_cards"])
+
+DEFAULT_LEVELS = (
+    LodLevel("LOD0", 16, 6, 0, 0.0, False),
+    LodLevel("LOD1", 8, 4, 4, 0.02, True),
+    LodLevel("LOD2", 6, 3, 2, 0.08, True),
+    LodLevel("LOD3", 4, 3, 1, 0.2, True),
+)
+
+# branches: tube MeshArrays, cards: leaf card MeshArrays, segments: how many were kept
+LodMesh = namedtuple("LodMesh", ["level", "branches", "cards", "segments"])
+
+
+def subtree_last(parent):
+    """Index of the last descendant of every segment (itself for a tip).
+
+    The interpreter emits every subtree as one contiguous index range, so
+    segment i owns [i, last[i]]. The last descendant is found by following
+    'last child' pointers with pointer doubling.
+    """
+    n = len(parent)
+    last_child = np.arange(n)
+    has_parent = parent >= 0
+    np.maximum.at(last_child, parent[has_parent], np.flatnonzero(has_parent))
+    last = last_child
+    while True:
+        jumped = last[last]
+        if np.array_equal(jumped, last):
+            return last
+        last = jumped
+
+
+def subtree_lengths(segments, last=None):
+    """Total segment length of every subtree"""
+    if last is None:
+        last = subtree_last(segments.parent)
+    lengths = np.linalg.norm(segments.end - segments.start, axis=1)
+    along = np.concatenate([[0.0], np.cumsum(lengths)])
+    return along[last + 1] - along[:-1]
+
+
+def subset_segments(segments, mask):
+    """Keep the segments selected by mask, renumbering parents (-1 if the parent was dropped)"""
+    index = np.flatnonzero(mask)
+    remap = np.full(len(mask) + 1, -1, dtype=np.int64)
+    remap[index] = np.arange(len(index))
+    # parent -1 reads remap[-1], which stays -1
+    parent = remap[segments.parent[index]]
+    return lsys_turtle.TurtleSegments(
+        start=segments.start[index],
+        end=segments.end[index],
+        radius=segments.radius[index],
+        depth=segments.depth[index],
+        parent=parent,
+        frame=segments.frame[index],
+    )
+
+
+def ring_sides(segments, level):
+    """Ring resolution per segment, reduced with bracket depth and with radius"""
+    sides = np.full(len(segments.start), float(level.sides))
+    if level.depth_step:
+        sides /= 2.0 ** (segments.depth // level.depth_step)
+    max_radius = segments.radius.max() if len(segments.radius) else 0.0
+    if max_radius > 0:
+        sides *= np.sqrt(segments.radius / max_radius)
+    return np.maximum(np.round(sides), level.min_sides).astype(np.int64)
+
+
+def leaf_cards(segments, pruned, roots):
+    """Two crossed quads per pruned subtree, covering its extent.
+
+    roots marks the first segment of every pruned subtree. Each card pair
+    is centred on the subtree's mean end point and faces along the line
+    from the root's start to that centre.
+    """
+    n_cards = int(roots.sum())
+    if n_cards == 0:
+        return lsys_mesh.empty_mesh()
+    cluster = (np.cumsum(roots) - 1)[pruned]
+    ends = segments.end[pruned]
+    counts = np.bincount(cluster, minlength=n_cards)[:, None]
+    centre = np.stack([np.bincount(cluster, ends[:, k], n_cards) for k in range(3)], axis=1) / counts
+    half_size = np.zeros(n_cards)
+    np.maximum.at(half_size, cluster, np.linalg.norm(ends - centre[cluster], axis=1))
+    half_size = np.maximum(half_size, 0.5 * np.linalg.norm(centre - segments.start[roots], axis=1))
+
+    frames = lsys_instances.directions_to_frames(centre - segments.start[roots])
+    up = frames[:, :, 2] * half_size[:, None]
+    vertices = []
+    for column in (0, 1):
+        side = frames[:, :, column] * half_size[:, None]
+        vertices += [centre - side - up, centre + side - up, centre + side + up, centre - side + up]
+    vertices = np.stack(vertices, axis=1).astype(np.float32)
+    faces = np.arange(8)[None] + (np.arange(n_cards) * 8)[:, None]
+    return lsys_mesh.MeshArrays(
+        vertices.reshape(-1, 3),
+        faces.reshape(-1).astype(np.int32),
+        np.full(2 * n_cards, 4, dtype=np.int32),
+    )
+
+
+def build_lod(segments, level, taper=1.0, lengths=None):
+    """Build the branch tubes and leaf cards of one level from interpreted segments"""
+    if lengths is None:
+        lengths = subtree_lengths(segments)
+    height = np.ptp(np.concatenate([segments.start, segments.end])[:, 2]) if len(segments.start) else 0.0
+    keep = lengths >= level.twig_fraction * height
+    cards = lsys_mesh.empty_mesh()
+    if level.leaf_cards and not keep.all():
+        pruned = ~keep
+        parent = segments.parent
+        roots = pruned & ((parent < 0) | keep[np.maximum(parent, 0)])
+        cards = leaf_cards(segments, pruned, roots)
+
+    kept = subset_segments(segments, keep)
+    sides = ring_sides(kept, level)
+    meshes = [
+        lsys_mesh.tube_mesh(subset_segments(kept, sides == count), sides=int(count), taper=taper)
+        for count in np.unique(sides)
+    ]
+    return LodMesh(level, lsys_mesh.merge_meshes(meshes), cards, int(keep.sum()))
+
+
+def build_lods(segments, levels=DEFAULT_LEVELS, taper=1.0):
+    """Build every level from one interpretation pass, finest first"""
+    lengths = subtree_lengths(segments)
+    return [build_lod(segments, level, taper, lengths) for level in levels]
+
+
+if __name__ == "__main__":
+    import sys
+
+    import lsys_stream
+
+    # Report the size of every level for L-system files, without Blender
+    for file_path in sys.argv[1:]:
+        segments = lsys_turtle.interpret(lsys_stream.iter_file_chunks(file_path))
+        print(f"{file_path}: {len(segments.start):,} segments")
+        for lod in build_lods(segments):
+            print(f"  {lod.level.name}: {lod.segments:,} segments, {len(lod.branches.vertices):,} branch vertices, "
+                  f"{len(lod.cards.face_sizes) // 2:,} leaf cards")
@@ -0,0 +1,185 @@
+from collections import namedtuple
+
+import numpy as np
+
+import lsys_instances
+
+# A mesh as flat arrays, ready for Blender's foreach_set or a file exporter:
+# vertices:   (V, 3) float32
+# faces:      (L,) int32 vertex index of every face corner, face after face
+# face_sizes: (F,) int32 corner count of every face
+MeshArrays = namedtuple("MeshArrays", ["vertices", "faces", "face_sizes"])
+
+
+def empty_mesh():
+    return MeshArrays(np.empty((0, 3), dtype=np.float32), np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32))
+
+
+def perpendicular_basis(directions):
+    """Return two unit vectors perpendicular to every (N, 3) direction, forming a right-handed frame.
+
+    They are the X and Y axes carried along by the shortest rotation from
+    +Z, as for an object aligned with lsys_instances.directions_to_quaternions.
+    """
+    frames = lsys_instances.directions_to_frames(directions)
+    return frames[:, :, 0], frames[:, :, 1]
+
+
+def cylinder_mesh(start, end, radius, frame=None, sides=16, caps=True):
+    """Build one mesh holding a cylinder per segment, like primitive_cylinder_add would.
+
+    start and end are (N, 3), radius is a scalar or (N,). Rings are oriented
+    with the turtle frame when given (columns 0 and 1), otherwise with an
+    arbitrary basis around the segment. Faces wind outwards; caps are n-gons.
+    """
+    start = np.asarray(start, dtype=float)
+    end = np.asarray(end, dtype=float)
+    n = len(start)
+    if n == 0:
+        return empty_mesh()
+    radius = np.broadcast_to(np.asarray(radius, dtype=float), (n,))
+    if frame is not None:
+        u, v = frame[:, :, 0], frame[:, :, 1]
+    else:
+        u, v = perpendicular_basis(end - start)
+
+    theta = np.linspace(0.0, 2.0 * np.pi, sides, endpoint=False)
+    # (N, sides, 3) offsets of a ring around each segment
+    ring = (np.cos(theta)[None, :, None] * u[:, None, :] + np.sin(theta)[None, :, None] * v[:, None, :])
+    ring *= radius[:, None, None]
+    vertices = np.empty((n, 2, sides, 3), dtype=np.float32)
+    vertices[:, 0] = start[:, None, :] + ring
+    vertices[:, 1] = end[:, None, :] + ring
+
+    base = (np.arange(n) * 2 * sides)[:, None, None]
+    i = np.arange(sides)
+    j = (i + 1) % sides
+    quads = np.stack([i, j, j + sides, i + sides], axis=1)[None] + base
+    parts = [quads.reshape(-1)]
+    sizes = [np.full(n * sides, 4)]
+    if caps:
+        bottom = i[::-1][None] + base[:, :, 0]
+        top = (i + sides)[None] + base[:, :, 0]
+        parts += [bottom.reshape(-1), top.reshape(-1)]
+        sizes += [np.full(2 * n, sides)]
+    return MeshArrays(
+        vertices.reshape(-1, 3),
+        np.concatenate(parts).astype(np.int32),
+        np.concatenate(sizes).astype(np.int32),
+    )
+
+
+def segments_mesh(segments, sides=16, caps=True):
+    """Cylinder mesh for every segment of lsys_turtle.interpret"""
+    return cylinder_mesh(segments.start, segments.end, segments.radius, segments.frame, sides, caps)
+
+
+def segment_chains(segments, max_bend=0.0):
+    """Split turtle segments into continuous chains, returning the chain id of every segment.
+
+    Segment i continues segment i - 1 when that is its parent, the parent
+    has no other child and the two turn by at most max_bend radians. The
+    interpreter emits the only child of a segment right after it, so every
+    chain is a contiguous index range and ids increase with the index.
+    """
+    n = len(segments.start)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    parent = segments.parent
+    child_count = np.bincount(parent[parent >= 0], minlength=n)
+    directions = _unit(segments.end - segments.start)
+    continues = np.zeros(n, dtype=bool)
+    continues[1:] = (parent[1:] == np.arange(n - 1)) & (child_count[:-1] == 1)
+    bend = np.einsum("ij,ij->i", directions[1:], directions[:-1])
+    continues[1:] &= bend >= np.cos(max_bend) - 1e-9
+    return np.cumsum(~continues) - 1
+
+
+def _unit(vectors):
+    norm = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norm, out=np.zeros_like(vectors), where=norm > 0)
+
+
+def tube_mesh(segments, sides=16, caps=True, taper=1.0, max_bend=0.0):
+    """Build one swept tube per chain of segment_chains instead of one cylinder per segment.
+
+    Joints share a single ring, so a chain of m segments has m + 1 rings
+    rather than 2m and no hidden faces inside the branch. A chain's radius
+    goes linearly from the segment radius at its start to taper times that
+    at its end. Rings at a bend are oriented along the bisector of the two
+    segments and widened so the tube keeps its thickness.
+    """
+    n = len(segments.start)
+    if n == 0:
+        return empty_mesh()
+    chain = segment_chains(segments, max_bend)
+    n_chains = int(chain[-1]) + 1
+    heads = np.flatnonzero(np.diff(chain, prepend=-1))
+    last = np.append(heads[1:] - 1, n - 1)
+    continued = np.zeros(n, dtype=bool)
+    continued[:-1] = chain[1:] == chain[:-1]
+
+    # Ring r of segment i's start is i + chain[i]; its end ring is the next one
+    start_ring = np.arange(n) + chain
+    n_rings = n + n_chains
+    directions = _unit(segments.end - segments.start)
+    positions = np.empty((n_rings, 3))
+    positions[start_ring + 1] = segments.end
+    positions[heads + np.arange(n_chains)] = segments.start[heads]
+    tangents = np.empty((n_rings, 3))
+    tangents[heads + np.arange(n_chains)] = directions[heads]
+    joint = directions.copy()
+    joint[continued] += directions[1:][continued[:-1]]
+    tangents[start_ring + 1] = _unit(joint)
+    # Widen joint rings by 1 / cos(half the bend), capped at 2x for very sharp bends
+    miter = np.ones(n_rings)
+    miter[start_ring + 1] = 1.0 / np.maximum(np.einsum("ij,ij->i", tangents[start_ring + 1], directions), 0.5)
+
+    lengths = np.linalg.norm(segments.end - segments.start, axis=1)
+    along = np.cumsum(lengths)
+    chain_offset = (along - lengths)[heads]
+    chain_length = along[last] - chain_offset
+    fraction = np.zeros(n_rings)
+    fraction[start_ring + 1] = np.divide(along - chain_offset[chain], chain_length[chain],
+                                         out=np.ones(n), where=chain_length[chain] > 0)
+    radius = np.empty(n_rings)
+    radius[start_ring + 1] = segments.radius
+    radius[heads + np.arange(n_chains)] = segments.radius[heads]
+    radius *= 1.0 - (1.0 - taper) * fraction
+    radius *= miter
+
+    u, v = perpendicular_basis(tangents)
+    theta = np.linspace(0.0, 2.0 * np.pi, sides, endpoint=False)
+    ring = (np.cos(theta)[None, :, None] * u[:, None, :] + np.sin(theta)[None, :, None] * v[:, None, :])
+    vertices = (positions[:, None, :] + ring * radius[:, None, None]).astype(np.float32)
+
+    i = np.arange(sides)
+    j = (i + 1) % sides
+    base = (start_ring * sides)[:, None, None]
+    quads = np.stack([i, j, j + sides, i + sides], axis=1)[None] + base
+    parts = [quads.reshape(-1)]
+    sizes = [np.full(n * sides, 4)]
+    if caps:
+        bottom = i[::-1][None] + (start_ring[heads] * sides)[:, None]
+        top = i[None] + ((start_ring[last] + 1) * sides)[:, None]
+        parts += [bottom.reshape(-1), top.reshape(-1)]
+        sizes += [np.full(2 * n_chains, sides)]
+    return MeshArrays(
+        vertices.reshape(-1, 3),
+        np.concatenate(parts).astype(np.int32),
+        np.concatenate(sizes).astype(np.int32),
+    )
+
+
+def merge_meshes(meshes):
+    """Concatenate several MeshArrays into one, offsetting the face indices"""
+    meshes = [mesh for mesh in meshes if len(mesh.vertices)]
+    if not meshes:
+        return empty_mesh()
+    offsets = np.cumsum([0] + [len(mesh.vertices) for mesh in meshes[:-1]])
+    return MeshArrays(
+        np.concatenate([mesh.vertices for mesh in meshes]),
+        np.concatenate([mesh.faces + offset for mesh, offset in zip(meshes, offsets)]).astype(np.int32),
+        np.concatenate([mesh.face_sizes for mesh in meshes]),
+    )
+
@@ -0,0 +1,85 @@
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def print_progress(metrics):
+    """Default progress callback: one status line on stderr"""
+    if metrics.total:
+        done = f"{metrics.processed:,}/{metrics.total:,} symbols ({100 * metrics.processed / metrics.total:.1f}%)"
+    else:
+        done = f"{metrics.processed:,} symbols"
+    print(f"{metrics.name}: {done}, {metrics.segments:,} segments, "
+          f"{metrics.elapsed():.1f}s", file=sys.stderr, flush=True)
+
+
+class TurtleMetrics:
+    """Instrumentation for a turtle run, passed as interpret(..., metrics=...).
+
+    The interpreter reports once per chunk of symbols, never per symbol, so
+    the cost does not grow with the string. progress(metrics) is called at
+    most every `interval` seconds; use timer() to split the run into phases
+    such as "interpret" and "mesh", and summary() / write_json() to get
+    everything as one JSON object for batch monitoring.
+    """
+
+    def __init__(self, name="lsystem", total=None, progress=print_progress, interval=1.0):
+        self.name = name
+        self.total = total
+        self.progress = progress
+        self.interval = interval
+        self.processed = 0
+        self.segments = 0
+        self.peak_depth = 0
+        self._counts = np.zeros(256, dtype=np.int64)
+        self.timings = {}
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    @property
+    def opcodes(self):
+        """Symbol -> number of occurrences seen so far"""
+        return {chr(i): int(n) for i, n in enumerate(self._counts) if n}
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def timer(self, phase):
+        """Add the wall time of the with-block to timings[phase]"""
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.timings[phase] = self.timings.get(phase, 0.0) + time.perf_counter() - started
+
+    def chunk(self, chunk, segments):
+        """Record one interpreted chunk; segments is the running segment count"""
+        data = chunk.encode("ascii") if isinstance(chunk, str) else chunk
+        self._counts += np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+        self.processed += len(chunk)
+        self.segments = segments
+        now = time.perf_counter()
+        if self.progress is not None and now - self._last_report >= self.interval:
+            self._last_report = now
+            self.progress(self)
+
+    def summary(self):
+        total_time = self.elapsed()
+        return {
+            "name": self.name,
+            "symbols": self.processed,
+            "segments": self.segments,
+            "peak_depth": self.peak_depth,
+            "opcodes": self.opcodes,
+            "timings": {phase: round(seconds, 6) for phase, seconds in self.timings.items()},
+            "total_time": round(total_time, 6),
+            "symbols_per_second": round(self.processed / total_time) if total_time else None,
+        }
+
+    def write_json(self, file_path):
+        with open(file_path, "w") as file:
+            json.dump(self.summary(), file, indent=2)
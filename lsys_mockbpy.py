@@ -0,0 +1,264 @@
+"""A minimal stand-in for Blender's bpy module, for running BlenderWriter and lsys_blender headless.
+
+It covers only the calls those two make. Mesh data set through
+foreach_set is kept as NumPy arrays and checked against the element
+counts the way Blender checks it, and save_as_mainfile writes every mesh
+of the session to an .npz file instead of a .blend.
+"""
+import numpy as np
+
+import lsys_export
+
+# Values per element of the foreach_set attributes used by lsys_blender
+_ATTRIBUTE_WIDTHS = {"co": 3, "vertex_index": 1, "loop_start": 1, "loop_total": 1, "vector": 3}
+
+
+class _Named:
+    def __init__(self, name):
+        self.name = name
+
+
+class _Property:
+    # Blender 4.0 and later derive loop_total from loop_start
+    is_readonly = True
+
+
+class _Rna:
+    properties = {"loop_total": _Property()}
+
+
+class _Elements:
+    """vertices / loops / polygons of a mesh, or the data of an attribute"""
+
+    bl_rna = _Rna()
+
+    def __init__(self, count=0):
+        self.count = count
+        self.values = {}
+
+    def __len__(self):
+        return self.count
+
+    def add(self, count):
+        self.count += count
+
+    def foreach_set(self, attribute, values):
+        values = np.asarray(values)
+        width = _ATTRIBUTE_WIDTHS[attribute]
+        if values.size != self.count * width:
+            raise RuntimeError(f"foreach_set({attribute!r}): got {values.size} values, expected {self.count * width}")
+        # Empty arrays are fine, as in Blender
+        self.values[attribute] = values.reshape(-1, width).copy()
+
+
+class _Attribute(_Named):
+    def __init__(self, name, count):
+        super().__init__(name)
+        self.data = _Elements(count)
+
+
+class _Attributes:
+    def __init__(self, mesh):
+        self.mesh = mesh
+        self.items = {}
+
+    def new(self, name, data_type, domain):
+        self.items[name] = _Attribute(name, len(self.mesh.vertices))
+        return self.items[name]
+
+
+class Mesh(_Named):
+    def __init__(self, name):
+        super().__init__(name)
+        self.vertices = _Elements()
+        self.loops = _Elements()
+        self.polygons = _Elements()
+        self.attributes = _Attributes(self)
+
+    def update(self, calc_edges=False):
+        if "vertex_index" in self.loops.values:
+            corners = self.loops.values["vertex_index"]
+            if len(corners) and not (0 <= corners.min() and corners.max() < len(self.vertices)):
+                raise RuntimeError(f"Mesh {self.name!r} has loops outside its {len(self.vertices)} vertices")
+        if "loop_start" in self.polygons.values:
+            start = self.polygons.values["loop_start"].ravel()
+            if np.any(np.diff(np.append(start, len(self.loops))) < 1):
+                raise RuntimeError(f"Mesh {self.name!r} has polygons without loops")
+
+    def arrays(self):
+        """The data set on this mesh, keyed like 'vertices.co' or 'attributes.instance_scale'"""
+        arrays = {}
+        for part in ("vertices", "loops", "polygons"):
+            for attribute, values in getattr(self, part).values.items():
+                arrays[f"{part}.{attribute}"] = values
+        for name, attribute in self.attributes.items.items():
+            arrays[f"attributes.{name}"] = attribute.data.values["vector"]
+        return arrays
+
+
+class _Vector:
+    def __init__(self):
+        self.x = self.y = self.z = 0.0
+
+
+class _Modifier(_Named):
+    def __init__(self, name, modifier_type):
+        super().__init__(name)
+        self.type = modifier_type
+        self.node_group = None
+
+
+class _Modifiers(list):
+    def new(self, name, modifier_type):
+        self.append(_Modifier(name, modifier_type))
+        return self[-1]
+
+
+class Object(_Named):
+    def __init__(self, name, data):
+        super().__init__(name)
+        self.data = data
+        self.modifiers = _Modifiers()
+        self.rotation_euler = _Vector()
+        self.hide_viewport = self.hide_render = False
+
+    def copy(self):
+        copy = Object(self.name, self.data)
+        copy.modifiers = self.modifiers
+        return copy
+
+
+class _ObjectLinks(list):
+    def link(self, obj):
+        self.append(obj)
+
+    def unlink(self, obj):
+        self.remove(obj)
+
+
+class Collection(_Named):
+    def __init__(self, name):
+        super().__init__(name)
+        self.objects = _ObjectLinks()
+        self.children = _ObjectLinks()
+
+
+class _Socket(_Named):
+    def __init__(self, name):
+        super().__init__(name)
+        self.default_value = None
+
+
+class _Sockets:
+    """Node inputs or outputs, created on first use by name or position"""
+
+    def __init__(self):
+        self.sockets = {}
+
+    def __contains__(self, key):
+        return True
+
+    def __getitem__(self, key):
+        return self.sockets.setdefault(key, _Socket(key))
+
+
+class _Node(_Named):
+    def __init__(self, node_type):
+        super().__init__(node_type)
+        self.inputs = _Sockets()
+        self.outputs = _Sockets()
+        self.data_type = None
+
+
+class _Nodes(list):
+    def new(self, node_type):
+        self.append(_Node(node_type))
+        return self[-1]
+
+
+class _Links(list):
+    def new(self, output, input):
+        self.append((output, input))
+        return self[-1]
+
+
+class _Interface:
+    def __init__(self):
+        self.items_tree = []
+
+    def new_socket(self, name, in_out, socket_type):
+        self.items_tree.append((name, in_out, socket_type))
+        return self.items_tree[-1]
+
+
+class NodeTree(_Named):
+    def __init__(self, name, tree_type):
+        super().__init__(name)
+        self.type = tree_type
+        self.interface = _Interface()
+        self.nodes = _Nodes()
+        self.links = _Links()
+
+
+class _BlendData(list):
+    def __init__(self, make):
+        super().__init__()
+        self.make = make
+
+    def new(self, name, *args):
+        self.append(self.make(name, *args))
+        return self[-1]
+
+
+class _Data:
+    def __init__(self):
+        self.meshes = _BlendData(Mesh)
+        self.objects = _BlendData(Object)
+        self.collections = _BlendData(Collection)
+        self.node_groups = _BlendData(NodeTree)
+
+
+class _Context:
+    def __init__(self):
+        self.scene = _Named("Scene")
+        self.scene.collection = Collection("Scene Collection")
+        self.collection = self.scene.collection
+        self.selected_objects = []
+
+
+class _WindowManagerOps:
+    def read_homefile(self, use_empty=False):
+        global data, context
+        data = _Data()
+        context = _Context()
+
+    def obj_import(self, filepath):
+        mesh_arrays = lsys_export.read_obj(filepath)
+        mesh = data.meshes.new("Imported")
+        mesh.vertices.add(len(mesh_arrays.vertices))
+        mesh.vertices.foreach_set("co", mesh_arrays.vertices.ravel())
+        obj = data.objects.new("Imported", mesh)
+        context.collection.objects.link(obj)
+        context.selected_objects = [obj]
+
+    def save_as_mainfile(self, filepath):
+        arrays = {}
+        for mesh in data.meshes:
+            arrays.update((f"{mesh.name}.{key}", values) for key, values in mesh.arrays().items())
+        np.savez_compressed(filepath, **arrays)
+
+
+class _Ops:
+    def __init__(self):
+        self.wm = _WindowManagerOps()
+
+
+class _App:
+    binary_path = None
+    version = (4, 0, 0)
+
+
+app = _App()
+ops = _Ops()
+data = _Data()
+context = _Context()
@@ -0,0 +1,170 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import lsys_brackets
+import lsys_turtle
+
+# Per-segment output arrays, allocated in shared memory and filled in place
+# by the main process and the workers: name, dtype, shape of one row
+_FIELDS = (
+    ("start", np.float64, (3,)),
+    ("end", np.float64, (3,)),
+    ("depth", np.int32, ()),
+    ("parent", np.int64, ()),
+    ("frame", np.float64, (3, 3)),
+)
+_F = ord("F")
+
+
+def split_subtrees(pairs, max_span, min_span=0):
+    """Pick disjoint bracket pairs to interpret on their own.
+
+    A pair is picked when it spans at most max_span symbols and no larger
+    pair around it does, i.e. the outermost subtrees that are small enough
+    for one task. Pairs shorter than min_span are left to the main process.
+    pairs come from lsys_brackets.bracket_pairs, ordered by '['.
+    """
+    span = pairs[:, 1] - pairs[:, 0] + 1
+    candidates = pairs[span <= max_span]
+    if len(candidates) == 0:
+        return candidates
+    # Brackets nest, so a candidate lies inside an earlier one exactly when
+    # an earlier candidate closes after it opens
+    closed_before = np.maximum.accumulate(candidates[:, 1])
+    outermost = np.ones(len(candidates), dtype=bool)
+    outermost[1:] = candidates[1:, 0] > closed_before[:-1]
+    picked = candidates[outermost]
+    return picked[picked[:, 1] - picked[:, 0] + 1 >= min_span]
+
+
+def _field_arrays(buffers, n):
+    return {name: np.ndarray((n,) + shape, dtype=dtype, buffer=buffer.buf)
+            for (name, dtype, shape), buffer in zip(_FIELDS, buffers)}
+
+
+def _store(arrays, segments, first):
+    stop = first + len(segments.start)
+    for name, _, _ in _FIELDS:
+        arrays[name][first:stop] = getattr(segments, name)
+
+
+def _interpret_subtree(task):
+    symbols_name, output_names, n_segments, open_pos, close_pos, state, frame, angle, length, turn_axes = task
+    # Pool workers share the parent's resource tracker, which unlinks the blocks once
+    memories = [shared_memory.SharedMemory(name=name) for name in (symbols_name,) + output_names]
+    arrays = None
+    try:
+        text = str(memories[0].buf[open_pos:close_pos + 1], "ascii")
+        table = lsys_turtle.FrameTable(angle, length, turn_axes)
+        rows = lsys_turtle.RunRows()
+        state = state._replace(frame_id=table.add(np.asarray(frame)))
+        # The subtree starts at its '[' depth, walk grows the stack to it
+        lsys_turtle.walk([text], table, rows, state, [])
+        arrays = _field_arrays(memories[1:], n_segments)
+        _store(arrays, lsys_turtle.expand_rows(table, rows, 1.0, 1.0, state.count), state.count)
+    finally:
+        arrays = None
+        for memory in memories:
+            memory.close()
+    return close_pos
+
+
+def interpret_parallel(symbols, angle=lsys_turtle.DEFAULT_ANGLE, length=1.0, radius=0.05, radius_reduction=1.0,
+                       processes=None, min_span=1 << 16, turn_axes=lsys_turtle.TURN_AXES):
+    """lsys_turtle.interpret for one long string, with large subtrees interpreted on a process pool.
+
+    '[' and ']' save and restore the whole turtle state, so once the state
+    at a '[' is known its subtree does not depend on anything else. The
+    bracket index (lsys_brackets, one cumulative sum) picks subtrees of at
+    least min_span symbols. The main process walks the string with those
+    subtrees cut out, which gives every subtree its entry state, and hands
+    each one to a worker as soon as it is reached. Segment numbering is
+    known up front from a prefix count of F, so workers write straight into
+    shared-memory output arrays. The result matches interpret() on the same
+    string, frames to within rounding. Brackets must balance.
+    """
+    data = lsys_brackets.as_symbol_array(symbols)
+    # The turtle walks str; bytes would be iterated as ints
+    if not isinstance(symbols, str):
+        symbols = str(data.tobytes(), "ascii")
+    workers = processes or os.cpu_count() or 1
+    pairs = lsys_brackets.bracket_pairs(data)
+    subtrees = split_subtrees(pairs, max(min_span, len(data) // (4 * workers)), min_span)
+    if workers == 1 or len(subtrees) == 0:
+        return lsys_turtle.interpret(symbols, angle, length, radius, radius_reduction, turn_axes=turn_axes)
+
+    f_before = np.concatenate([[0], np.cumsum(data == _F)])
+    n_segments = int(f_before[-1])
+    memories = [shared_memory.SharedMemory(create=True, size=max(len(data), 1))]
+    memories += [shared_memory.SharedMemory(create=True, size=max(n_segments * np.dtype(dtype).itemsize
+                                                                   * int(np.prod(shape)), 1))
+                 for _, dtype, shape in _FIELDS]
+    arrays = None
+    try:
+        np.ndarray(len(data), dtype=np.uint8, buffer=memories[0].buf)[:] = data
+        names = tuple(memory.name for memory in memories)
+        arrays = _field_arrays(memories[1:], n_segments)
+
+        table = lsys_turtle.FrameTable(angle, length, turn_axes)
+        stack = []
+        state = lsys_turtle.INITIAL_STATE
+        position = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for open_pos, close_pos in subtrees.tolist():
+                state = _walk_piece(symbols[position:open_pos], table, state, stack, arrays)
+                task = (names[0], names[1:], n_segments, open_pos, close_pos, state,
+                        table.frames[state.frame_id], angle, length, turn_axes)
+                futures.append(executor.submit(_interpret_subtree, task))
+                # The subtree's segments are numbered by its worker; ']' restores the rest of the state
+                state = state._replace(count=int(f_before[close_pos + 1]))
+                position = close_pos + 1
+            _walk_piece(symbols[position:], table, state, stack, arrays)
+            for future in futures:
+                future.result()
+
+        depth = arrays["depth"].copy()
+        segments = lsys_turtle.TurtleSegments(
+            start=arrays["start"].copy(),
+            end=arrays["end"].copy(),
+            radius=radius * np.power(radius_reduction, depth, dtype=float),
+            depth=depth,
+            parent=arrays["parent"].copy(),
+            frame=arrays["frame"].copy(),
+        )
+        return segments
+    finally:
+        # The views must go before the blocks can be closed
+        arrays = None
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+
+
+def _walk_piece(text, table, state, stack, arrays):
+    rows = lsys_turtle.RunRows()
+    first = state.count
+    state = lsys_turtle.walk([text], table, rows, state, stack)
+    _store(arrays, lsys_turtle.expand_rows(table, rows, 1.0, 1.0, first), first)
+    return state
+
+
+if __name__ == "__main__":
+    import time
+
+    import lsys_stream
+
+    # Compare sequential and branch-parallel interpretation of L-system files
+    for file_path in sys.argv[1:]:
+        symbols = "".join(lsys_stream.iter_file_chunks(file_path))
+        started = time.perf_counter()
+        sequential = lsys_turtle.interpret(symbols)
+        middle = time.perf_counter()
+        parallel = interpret_parallel(symbols)
+        finished = time.perf_counter()
+        print(f"{file_path}: {len(parallel.start):,} segments, sequential {middle - started:.3f}s, "
+              f"parallel {finished - middle:.3f}s on {os.cpu_count()} cores")
@@ -0,0 +1,171 @@
+import math
+import random
+import re
+from array import array
+from collections import namedtuple
+
+# A parametric string stored as flat arrays instead of text:
+# alphabet: list of symbols, symbols[i] indexes into it
+# symbols:  array('H') of symbol ids, one per module
+# offsets:  array('I') of len(symbols) + 1, module i owns params[offsets[i]:offsets[i + 1]]
+# params:   array('d') of every numeric parameter
+ParamModules = namedtuple("ParamModules", ["alphabet", "symbols", "offsets", "params"])
+
+# Names available inside parameter expressions
+EXPRESSION_NAMESPACE = {
+    "__builtins__": {},
+    "sqrt": math.sqrt, "sin": math.sin, "cos": math.cos, "pi": math.pi,
+    "min": min, "max": max, "abs": abs,
+}
+
+_PLACEHOLDER = re.compile(r"\{(\d+)\}")
+
+
+def split_modules(text):
+    """Split module text like 'F(x*2)[+A(1,2)]' into (symbol, [argument source]) pairs"""
+    modules = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char in "(),":
+            raise ValueError(f"Unexpected {char!r} at position {i} in {text!r}")
+        i += 1
+        args = []
+        if i < len(text) and text[i] == "(":
+            depth = 0
+            start = i + 1
+            while True:
+                if i >= len(text):
+                    raise ValueError(f"Unbalanced parentheses in {text!r}")
+                if text[i] == "(":
+                    depth += 1
+                elif text[i] == ")":
+                    depth -= 1
+                    if depth == 0:
+                        args.append(text[start:i].strip())
+                        break
+                elif text[i] == "," and depth == 1:
+                    args.append(text[start:i].strip())
+                    start = i + 1
+                i += 1
+            i += 1
+        modules.append((char, args))
+    return modules
+
+
+def _symbol_id(alphabet, index, symbol):
+    if symbol not in index:
+        index[symbol] = len(alphabet)
+        alphabet.append(symbol)
+    return index[symbol]
+
+
+def parse_modules(text, alphabet=None):
+    """Parse a string of modules with numeric arguments, such as an axiom, into ParamModules"""
+    alphabet = [] if alphabet is None else alphabet
+    index = {symbol: i for i, symbol in enumerate(alphabet)}
+    symbols = array("H")
+    offsets = array("I", [0])
+    params = array("d")
+    for symbol, args in split_modules(text):
+        symbols.append(_symbol_id(alphabet, index, symbol))
+        for arg in args:
+            params.append(float(eval(arg, EXPRESSION_NAMESPACE)))
+        offsets.append(len(params))
+    return ParamModules(alphabet, symbols, offsets, params)
+
+
+def _compile_successor(successor, formals, alphabet, index):
+    """Compile a successor into (symbol ids, offsets, function of the formals returning all params)"""
+    symbols = array("H")
+    offsets = array("I", [0])
+    expressions = []
+    for symbol, args in split_modules(successor):
+        symbols.append(_symbol_id(alphabet, index, symbol))
+        for arg in args:
+            # '{0}' style placeholders refer to the predecessor's parameters by position
+            expressions.append(_PLACEHOLDER.sub(lambda m: formals[int(m.group(1))], arg))
+        offsets.append(len(expressions))
+    source = f"lambda {', '.join(formals)}: ({''.join(e + ', ' for e in expressions)})"
+    try:
+        function = eval(source, EXPRESSION_NAMESPACE)
+    except SyntaxError as e:
+        raise ValueError(f"Cannot compile successor {successor!r}: {e}") from None
+    return symbols, offsets, function
+
+
+def compile_param_rules(rules, alphabet):
+    """Compile rules keyed like 'A(l,w)' into {(symbol id, arity): [successor templates]}"""
+    index = {symbol: i for i, symbol in enumerate(alphabet)}
+    compiled = {}
+    for predecessor, successors in rules.items():
+        ((symbol, formals),) = split_modules(predecessor)
+        for formal in formals:
+            if not formal.isidentifier():
+                raise ValueError(f"Formal parameter {formal!r} of {predecessor!r} is not a name")
+        if not isinstance(successors, list):
+            successors = [successors]
+        key = (_symbol_id(alphabet, index, symbol), len(formals))
+        compiled[key] = [_compile_successor(s, formals, alphabet, index) for s in successors]
+    return compiled
+
+
+def rewrite_param(modules, compiled, stochastic=False, choice=random.choice):
+    """Apply one generation of compiled parametric rules, evaluating every parameter"""
+    old_symbols, old_offsets, old_params = modules.symbols, modules.offsets, modules.params
+    symbols = array("H")
+    offsets = array("I", [0])
+    params = array("d")
+    for i, symbol in enumerate(old_symbols):
+        start, end = old_offsets[i], old_offsets[i + 1]
+        templates = compiled.get((symbol, end - start))
+        if templates is None:
+            symbols.append(symbol)
+            params.extend(old_params[start:end])
+            offsets.append(len(params))
+            continue
+        if len(templates) > 1:
+            if not stochastic:
+                raise ValueError("Rules with several alternatives need stochastic=True")
+            template = choice(templates)
+        else:
+            template = templates[0]
+        successor_symbols, successor_offsets, function = template
+        base = len(params)
+        symbols.extend(successor_symbols)
+        params.extend(function(*old_params[start:end]))
+        offsets.extend([base + offset for offset in successor_offsets[1:]])
+    return ParamModules(modules.alphabet, symbols, offsets, params)
+
+
+def generate(axiom, rules, iterations, stochastic=False, choice=random.choice):
+    """Expand a parametric L-system, returning ParamModules with numeric parameters"""
+    modules = parse_modules(axiom)
+    compiled = compile_param_rules(rules, modules.alphabet)
+    for _ in range(iterations):
+        modules = rewrite_param(modules, compiled, stochastic, choice)
+    return modules
+
+
+def iter_modules(modules):
+    """Yield (symbol, params tuple) for every module"""
+    alphabet, offsets, params = modules.alphabet, modules.offsets, modules.params
+    for i, symbol in enumerate(modules.symbols):
+        yield alphabet[symbol], tuple(params[offsets[i]:offsets[i + 1]])
+
+
+def format_modules(modules, precision=None):
+    """Render ParamModules back to text such as 'F(1.1)[+F(0.7)]'.
+
+    Values are written as repr, the shortest text that parses back to the
+    same float, or with precision significant digits. Either may use
+    exponents such as 1e-07, which parse_modules reads back.
+    """
+    format_value = repr if precision is None else (lambda value: f"{value:.{precision}g}")
+    parts = []
+    for symbol, values in iter_modules(modules):
+        if values:
+            parts.append(f"{symbol}({','.join(format_value(v) for v in values)})")
+        else:
+            parts.append(symbol)
+    return "".join(parts)
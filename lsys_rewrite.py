@@ -0,0 +1,69 @@
+import random
+import re
+from collections import namedtuple
+
+# table:            symbol -> successor for the deterministic rules
+# single_rule:      (symbol, successor) when there is exactly one deterministic rule
+# stochastic_rules: symbol -> list of alternative successors
+# splitter:         regex splitting a string on the stochastic symbols
+CompiledRules = namedtuple("CompiledRules", ["table", "single_rule", "stochastic_rules", "splitter"])
+
+
+def compile_rules(rules):
+    """Precompile L-system rules into a translation table.
+
+    Rules given as a list of alternatives are kept aside, together with a
+    regex that splits a string on those symbols.
+    """
+    table = {}
+    stochastic_rules = {}
+    for symbol, successor in rules.items():
+        if len(symbol) != 1:
+            raise ValueError(f"Rule predecessor must be a single symbol, got {symbol!r}")
+        if isinstance(successor, list):
+            stochastic_rules[symbol] = successor
+        else:
+            table[symbol] = successor
+    single_rule = next(iter(table.items())) if len(table) == 1 else None
+    splitter = None
+    if stochastic_rules:
+        splitter = re.compile("([" + re.escape("".join(stochastic_rules)) + "])")
+    return CompiledRules(table, single_rule, stochastic_rules, splitter)
+
+
+def _translate(fragment, compiled):
+    """Rewrite a fragment that contains no stochastic symbols"""
+    if compiled.single_rule is not None:
+        # str.split/str.join never look at a character from Python code
+        symbol, successor = compiled.single_rule
+        return successor.join(fragment.split(symbol))
+    # map(table.get, s, s) is table.get(c, c) per symbol, driven from C
+    return "".join(map(compiled.table.get, fragment, fragment))
+
+
+def rewrite(l_system_string, compiled, stochastic=False, choice=random.choice):
+    """Apply one generation of compiled rules to l_system_string"""
+    if not compiled.stochastic_rules:
+        return _translate(l_system_string, compiled)
+    if not stochastic:
+        raise ValueError("Rules with several alternatives need stochastic=True")
+
+    # Odd entries of the split are stochastic symbols, even entries are the
+    # deterministic runs between them, so symbols are visited left to right
+    # and choice() is called in the same order as the per-character loop.
+    chunks = compiled.splitter.split(l_system_string)
+    for i in range(len(chunks)):
+        if i % 2:
+            chunks[i] = choice(compiled.stochastic_rules[chunks[i]])
+        elif chunks[i]:
+            chunks[i] = _translate(chunks[i], compiled)
+    return "".join(chunks)
+
+
+def generate(axiom, rules, iterations, stochastic=False, choice=random.choice):
+    """Expand axiom for the given number of iterations in linear time per generation"""
+    compiled = compile_rules(rules)
+    l_system_string = axiom
+    for _ in range(iterations):
+        l_system_string = rewrite(l_system_string, compiled, stochastic, choice)
+    return l_system_string
@@ -0,0 +1,94 @@
+import random
+import re
+
+import lsys_rewrite
+
+
+def iter_l_system_chunks(axiom, rules, iterations, stochastic=False, choice=random.choice, chunk_size=1 << 16):
+    """Yield the expanded L-system as string chunks without building the full string.
+
+    Rules are expanded depth first from an explicit stack holding one
+    successor per generation, so memory is O(iterations) rather than
+    O(string length). The last generation of every successor is rewritten
+    in one call to lsys_rewrite, so the Python-level loop only touches the
+    much shorter earlier generations. Chunks are roughly chunk_size symbols.
+
+    With stochastic rules choice() is called in depth-first order, so a
+    seeded stream differs from the generation-by-generation result of
+    lsys_rewrite.generate with the same seed.
+    """
+    compiled = lsys_rewrite.compile_rules(rules)
+    if iterations == 0 or not rules:
+        # Without rules every generation is the axiom
+        yield axiom
+        return
+    if iterations == 1:
+        yield lsys_rewrite.rewrite(axiom, compiled, stochastic, choice)
+        return
+    if compiled.stochastic_rules and not stochastic:
+        raise ValueError("Rules with several alternatives need stochastic=True")
+
+    rule_symbol = re.compile("[" + re.escape("".join(rules)) + "]")
+    pieces = []
+    pending = 0
+    # Each frame is [string, position, generation of the string]
+    stack = [[axiom, 0, 0]]
+    while stack:
+        frame = stack[-1]
+        string, pos, generation = frame
+        match = rule_symbol.search(string, pos)
+        end = match.start() if match else len(string)
+        if end > pos:
+            # Symbols without a rule are copied through unchanged
+            pieces.append(string[pos:end])
+            pending += end - pos
+        if not match:
+            stack.pop()
+        else:
+            frame[1] = end + 1
+            char = string[end]
+            successor = compiled.table.get(char)
+            if successor is None:
+                successor = choice(compiled.stochastic_rules[char])
+            if generation + 2 == iterations:
+                successor = lsys_rewrite.rewrite(successor, compiled, stochastic, choice)
+                pieces.append(successor)
+                pending += len(successor)
+            else:
+                stack.append([successor, 0, generation + 1])
+        if pending >= chunk_size:
+            yield "".join(pieces)
+            pieces = []
+            pending = 0
+    if pieces:
+        yield "".join(pieces)
+
+
+def iter_l_system(axiom, rules, iterations, stochastic=False, choice=random.choice):
+    """Yield the symbols of the expanded L-system one at a time"""
+    for chunk in iter_l_system_chunks(axiom, rules, iterations, stochastic, choice):
+        yield from chunk
+
+
+def iter_file_chunks(file_path, chunk_size=1 << 16):
+    """Yield an L-system text or binary (lsys_binfile) file in chunks instead of reading it in full"""
+    import lsys_binfile
+
+    if lsys_binfile.is_lsystem_file(file_path):
+        with lsys_binfile.LSystemFile(file_path) as binary_file:
+            yield from binary_file.iter_text_chunks()
+        return
+    with open(file_path, "r") as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def iter_file_symbols(file_path, chunk_size=1 << 16):
+    """Yield the symbols of an L-system file, skipping whitespace"""
+    for chunk in iter_file_chunks(file_path, chunk_size):
+        for char in chunk:
+            if not char.isspace():
+                yield char
@@ -0,0 +1,165 @@
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Blender needs the folder on sys.path first, see lsys_cli.script_args
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import lsys_cli
+import lsys_branching
+
+# Parameters a sweep may vary or fix, with their defaults: the keyword arguments of grow_branches
+SWEEP_DEFAULTS = {name: parameter.default
+                  for name, parameter in inspect.signature(lsys_branching.grow_branches).parameters.items()
+                  if name not in ("seed", "subtree")}
+SWEEP_PARAMETERS = tuple(SWEEP_DEFAULTS)
+
+
+def resolve_params(params):
+    """Every grow_branches argument of params, with defaults filled in for the ones it leaves out"""
+    unknown = set(params) - set(SWEEP_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters {sorted(unknown)}, expected some of {SWEEP_PARAMETERS}")
+    return dict(SWEEP_DEFAULTS, **params)
+
+
+def result_name(params, seed, prefix="tree"):
+    """Fixed file and index name of one (params, seed) result: prefix plus a hash of both.
+
+    The same parameters and seed always grow the same tree, so the name
+    replaces numbering files until one is free. The hash covers the
+    resolved parameters, so leaving out an argument and passing its
+    default give the same name.
+    """
+    text = json.dumps({"params": resolve_params(params), "seed": seed}, sort_keys=True)
+    return f"{prefix}_{hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]}"
+
+
+def load_grid(file_path):
+    """Read a sweep description: {"grid": {name: [values]}, "fixed": {name: value}, "seeds": n or [seeds]}.
+
+        {"grid": {"branch_count": [5, 6], "thickness_reduction": [0.6, 0.7]},
+         "fixed": {"max_height": 7, "spread_with_depth": true}, "seeds": 4}
+    """
+    with open(file_path, "r") as file:
+        sweep = json.load(file)
+    seeds = sweep.get("seeds", 1)
+    return sweep.get("grid", {}), sweep.get("fixed", {}), list(range(seeds)) if isinstance(seeds, int) else seeds
+
+
+def sweep_jobs(grid, fixed=None, seeds=(0,)):
+    """One job per combination of grid values and seed, as {"name", "params", "seed"} with resolved params"""
+    fixed = dict(fixed or {})
+    names = sorted(grid)
+    jobs = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = resolve_params(dict(fixed, **dict(zip(names, values))))
+        for seed in seeds:
+            jobs.append({"name": result_name(params, seed), "params": params, "seed": seed})
+    return jobs
+
+
+def grow_job(job):
+    return lsys_branching.grow_branches(**job["params"], seed=job["seed"])
+
+
+def measure_job(job):
+    """Grow one job without Blender and return its index record"""
+    started = time.perf_counter()
+    branches = grow_job(job)
+    seconds = time.perf_counter() - started
+    points = branches.points.reshape(-1, 3)
+    return {
+        "name": job["name"],
+        "params": job["params"],
+        "seed": job["seed"],
+        "segments": len(branches.parent),
+        "max_depth": int(branches.depth.max()),
+        # Of the control points, which the bevelled curve stays close to
+        "bbox_min": points.min(axis=0).round(6).tolist(),
+        "bbox_max": points.max(axis=0).round(6).tolist(),
+        "seconds": round(seconds, 6),
+    }
+
+
+def run_sweep(jobs, output_dir, processes=None):
+    """Measure every job on a process pool and write output_dir/sweep.jsonl, one record per line in job order.
+
+    Nothing is meshed or written per tree: pick results from the index
+    and export them with export_selected.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if processes == 1:
+        records = [measure_job(job) for job in jobs]
+    else:
+        workers = processes or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            records = list(executor.map(measure_job, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+    with open(os.path.join(output_dir, "sweep.jsonl"), "w") as index:
+        for record in records:
+            index.write(json.dumps(record) + "\n")
+    return records
+
+
+def load_index(output_dir):
+    with open(os.path.join(output_dir, "sweep.jsonl"), "r") as index:
+        return [json.loads(line) for line in index]
+
+
+def export_selected(records, output_dir):
+    """Regrow the selected index records inside Blender and save one .blend each as output_dir/<name>.blend.
+
+    Trees are regrown from their parameters and seed, which gives the
+    measured tree back exactly, instead of being kept from the sweep.
+    """
+    import bpy
+
+    import lsys_blender
+
+    paths = []
+    for record in records:
+        bpy.ops.wm.read_homefile(use_empty=True)
+        branches = grow_job(record)
+        lsys_blender.curve_from_branches("Tree", branches, bpy.context.scene.collection)
+        file_path = os.path.abspath(os.path.join(output_dir, record["name"] + ".blend"))
+        bpy.ops.wm.save_as_mainfile(filepath=file_path)
+        paths.append(file_path)
+        print(f"{record['name']} -> {file_path}", flush=True)
+    return paths
+
+
+def main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sweep the parameters of the bendy branching tree")
+    parser.add_argument("sweep", help="JSON grid, see load_grid")
+    parser.add_argument("output_dir")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--export", nargs="+", default=None, metavar="NAME",
+                        help="inside Blender: save these results of an earlier sweep as .blend files")
+    args = parser.parse_args(argv)
+
+    if args.export is not None:
+        records = {record["name"]: record for record in load_index(args.output_dir)}
+        missing = [name for name in args.export if name not in records]
+        if missing:
+            raise SystemExit(f"Not in the sweep index: {', '.join(missing)}")
+        export_selected([records[name] for name in args.export], args.output_dir)
+        return
+
+    jobs = sweep_jobs(*load_grid(args.sweep))
+    started = time.perf_counter()
+    records = run_sweep(jobs, args.output_dir, args.processes)
+    segments = np.array([record["segments"] for record in records])
+    print(f"Swept {len(records)} trees ({segments.sum():,} segments, up to {segments.max():,} per tree) "
+          f"in {time.perf_counter() - started:.1f}s; index in {os.path.join(args.output_dir, 'sweep.jsonl')}")
+
+
+if __name__ == "__main__":
+    main(lsys_cli.script_args())
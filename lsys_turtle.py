@@ -0,0 +1,408 @@
+import math
+import re
+from array import array
+from collections import namedtuple
+from contextlib import nullcontext
+
+import numpy as np
+
+# Turn symbols rotate the turtle about fixed world axes, as in the original
+# process_lsystem loops: + - about Z, & ^ about X, \ / about Y.
+TURN_AXES = {
+    "+": ((0, 0, 1), 1),
+    "-": ((0, 0, 1), -1),
+    "&": ((1, 0, 0), 1),
+    "^": ((1, 0, 0), -1),
+    "\\": ((0, 1, 0), 1),
+    "/": ((0, 1, 0), -1),
+}
+# The 2D script gen_tree_prod_blend_2d.py grows in the XZ plane: + - about Y,
+# & ^ about X, \ / about Z
+PLANAR_TURN_AXES = {
+    "+": ((0, 1, 0), 1),
+    "-": ((0, 1, 0), -1),
+    "&": ((1, 0, 0), 1),
+    "^": ((1, 0, 0), -1),
+    "\\": ((0, 0, 1), 1),
+    "/": ((0, 0, 1), -1),
+}
+DEFAULT_ANGLE = math.radians(25.7)
+
+# Interpreter output, one row per F:
+# start, end: (N, 3) segment end points
+# radius:     (N,) radius at the segment's bracket depth
+# depth:      (N,) bracket nesting depth
+# parent:     (N,) index of the segment this one grows from, -1 for the first
+# frame:      (N, 3, 3) turtle orientation, column 2 is the heading
+TurtleSegments = namedtuple("TurtleSegments", ["start", "end", "radius", "depth", "parent", "frame"])
+
+# Runs of F, runs of turns and brackets; every other symbol is a no-op for
+# the turtle and is skipped by findall without reaching Python code
+_TOKEN = re.compile(r"F+|[+\-&^\\/]+|[\[\]]")
+
+
+def rotation_matrix(axis, angle):
+    """Rodrigues rotation matrix about a unit axis, the same rotation rotate_vector applies"""
+    u, v, w = axis
+    c = math.cos(angle)
+    s = math.sin(angle)
+    t = 1 - c
+    return np.array([
+        [c + t * u * u, t * u * v - w * s, t * u * w + v * s],
+        [t * u * v + w * s, c + t * v * v, t * v * w - u * s],
+        [t * u * w - v * s, t * v * w + u * s, c + t * w * w],
+    ])
+
+
+def turn_matrices(angle=DEFAULT_ANGLE, turn_axes=TURN_AXES):
+    """Precompute the rotation of every turn symbol for one turning angle"""
+    return {symbol: rotation_matrix(axis, sign * angle) for symbol, (axis, sign) in turn_axes.items()}
+
+
+def compose_turns(turns, run):
+    """Compose a run of turn symbols such as '+&+' into one rotation matrix"""
+    matrix = np.eye(3)
+    for symbol in run:
+        # Later turns act on the already turned frame, so they multiply from the left
+        matrix = turns[symbol] @ matrix
+    return matrix
+
+
+def _iter_chunks(symbols, chunk_size=1 << 20):
+    if isinstance(symbols, str):
+        # Cut long strings so progress can be reported between chunks;
+        # a run of F or of turns split at a boundary interprets the same
+        for start in range(0, len(symbols), chunk_size):
+            yield symbols[start:start + chunk_size]
+        return
+    for chunk in symbols:
+        yield chunk if isinstance(chunk, str) else str(chunk, "ascii")
+
+
+def _product(a, b):
+    # a @ b for 3x3 matrices as row-major 9-tuples; plain floats beat NumPy at this size
+    a0, a1, a2, a3, a4, a5, a6, a7, a8 = a
+    b0, b1, b2, b3, b4, b5, b6, b7, b8 = b
+    return (a0 * b0 + a1 * b3 + a2 * b6, a0 * b1 + a1 * b4 + a2 * b7, a0 * b2 + a1 * b5 + a2 * b8,
+            a3 * b0 + a4 * b3 + a5 * b6, a3 * b1 + a4 * b4 + a5 * b7, a3 * b2 + a4 * b5 + a5 * b8,
+            a6 * b0 + a7 * b3 + a8 * b6, a6 * b1 + a7 * b4 + a8 * b7, a6 * b2 + a7 * b5 + a8 * b8)
+
+
+class FrameTable:
+    """Turtle orientations by integer id, with memoized turn transitions.
+
+    (id, run of turn symbols) -> id is computed once, from the turn
+    matrices composed into one rotation per run, so the interpreter applies
+    a whole run such as '-+&' with one dict lookup. Frames equal to within
+    1e-9 share an id, which keeps the table small when turns cancel out
+    (+ then -), as in planar L-systems.
+
+    Mixed-axis 3D strings rarely revisit a frame. Every `check` new
+    transitions the hit rate since the last check is measured, and below
+    min_hit_rate the memo is dropped and every turn is applied directly.
+    The memo is also cleared whenever it reaches max_entries.
+    """
+
+    def __init__(self, angle=DEFAULT_ANGLE, length=1.0, turn_axes=TURN_AXES, max_entries=1 << 18, check=4096,
+                 min_hit_rate=0.5):
+        self.turns = turn_matrices(angle, turn_axes)
+        self.run_matrices = {}
+        self.length = length
+        self.frames = []
+        self.headings = []
+        self.index = {}
+        self.transitions = {}
+        self.memoize = True
+        self.max_entries = max_entries
+        self.check = check
+        self.min_hit_rate = min_hit_rate
+        self.lookups = 0
+        self.misses = 0
+        self.add(np.eye(3))
+
+    def add(self, frame):
+        """Id of a 3x3 frame, interned while the memo is on"""
+        return self._add(tuple(np.asarray(frame, dtype=float).ravel().tolist()))
+
+    def _add(self, frame):
+        if self.memoize:
+            key = tuple([round(v, 9) for v in frame])
+            frame_id = self.index.get(key)
+            if frame_id is not None:
+                return frame_id
+            self.index[key] = len(self.frames)
+        self.frames.append(frame)
+        length = self.length
+        self.headings.append((frame[2] * length, frame[5] * length, frame[8] * length))
+        return len(self.frames) - 1
+
+    def turn(self, frame_id, run):
+        if self.memoize:
+            self.lookups += 1
+            next_id = self.transitions.get((frame_id, run))
+            if next_id is not None:
+                return next_id
+        matrix = self.run_matrices.get(run)
+        if matrix is None:
+            matrix = self.run_matrices[run] = tuple(compose_turns(self.turns, run).ravel().tolist())
+        next_id = self._add(_product(matrix, self.frames[frame_id]))
+        if self.memoize:
+            self.transitions[(frame_id, run)] = next_id
+            self.misses += 1
+            if self.misses == self.check:
+                self._review()
+        return next_id
+
+    def _review(self):
+        if self.lookups - self.misses < self.min_hit_rate * self.lookups:
+            self.memoize = False
+        if not self.memoize or len(self.transitions) >= self.max_entries:
+            self.index.clear()
+            self.transitions.clear()
+        self.lookups = self.misses = 0
+
+    def as_array(self):
+        return np.array(self.frames).reshape(-1, 3, 3)
+
+
+def interpret(symbols, angle=DEFAULT_ANGLE, length=1.0, radius=0.05, radius_reduction=1.0, max_depth=64,
+              metrics=None, turn_axes=TURN_AXES):
+    """Run the turtle over an L-system and return TurtleSegments, without touching Blender.
+
+    symbols can be a str or any iterable of str/bytes chunks, for example
+    lsys_stream.iter_l_system_chunks or LSystemFile.iter_chunks. The loop
+    only records one row per run of F (start, frame id, length, parent,
+    depth); the segments are expanded from those rows with NumPy at the
+    end. The bracket stack is preallocated with max_depth entries and grows
+    if a string nests deeper. Radius is radius * radius_reduction ** depth,
+    so the default 1.0 keeps the constant branch_thickness of the Blender
+    scripts. turn_axes maps the turn symbols to (axis, sign), see
+    PLANAR_TURN_AXES for the 2D script's convention.
+
+    metrics is an optional lsys_metrics.TurtleMetrics; it is updated once
+    per chunk and times the run under "interpret".
+    """
+    with metrics.timer("interpret") if metrics is not None else nullcontext():
+        table = FrameTable(angle, length, turn_axes)
+        rows = RunRows()
+        walk(_iter_chunks(symbols), table, rows, INITIAL_STATE, [None] * max_depth, metrics)
+        return expand_rows(table, rows, radius, radius_reduction)
+
+
+# Turtle state between two symbols: position (x, y, z), frame id in a
+# FrameTable, parent segment, bracket depth and the index the next segment gets
+TurtleState = namedtuple("TurtleState", ["position", "frame_id", "parent", "depth", "count"])
+INITIAL_STATE = TurtleState((0.0, 0.0, 0.0), 0, -1, 0, 0)
+
+
+class RunRows:
+    """Rows recorded by walk, one per run of F"""
+
+    def __init__(self):
+        self.start = array("d")
+        self.frame = array("q")
+        self.length = array("q")
+        self.parent = array("q")
+        self.depth = array("i")
+
+
+def walk(chunks, table, rows, state, stack, metrics=None):
+    """Interpret str chunks from state, appending to rows, and return the state after them.
+
+    stack holds the saved states of the open brackets, indexed by depth;
+    it is updated in place so a string can be walked in several pieces.
+    """
+    turn = table.turn
+    headings = table.headings
+    run_start = rows.start
+    run_frame = rows.frame
+    run_length = rows.length
+    run_parent = rows.parent
+    run_depth = rows.depth
+    (px, py, pz), frame_id, parent, depth, count = state
+    peak_depth = metrics.peak_depth if metrics is not None else 0
+
+    for chunk in chunks:
+        for token in _TOKEN.findall(chunk):
+            symbol = token[0]
+            if symbol == "F":
+                k = len(token)
+                run_start.extend((px, py, pz))
+                run_frame.append(frame_id)
+                run_length.append(k)
+                run_parent.append(parent)
+                run_depth.append(depth)
+                hx, hy, hz = headings[frame_id]
+                px += k * hx
+                py += k * hy
+                pz += k * hz
+                count += k
+                parent = count - 1
+            elif symbol in TURN_AXES:
+                frame_id = turn(frame_id, token)
+            elif symbol == "[":
+                if depth >= len(stack):
+                    # Doubles, or reaches the depth of a state that entered deeper than the stack
+                    stack.extend([None] * max(len(stack), depth + 1 - len(stack)))
+                stack[depth] = (px, py, pz, frame_id, parent)
+                depth += 1
+                if depth > peak_depth:
+                    peak_depth = depth
+            elif symbol == "]":
+                # An unmatched ] is ignored, like the `if stack:` guard in the Blender scripts
+                if depth:
+                    depth -= 1
+                    px, py, pz, frame_id, parent = stack[depth]
+        if metrics is not None:
+            metrics.peak_depth = peak_depth
+            metrics.chunk(chunk, count)
+
+    return TurtleState((px, py, pz), frame_id, parent, depth, count)
+
+
+def expand_rows(table, rows, radius, radius_reduction, first=0):
+    """Turn the rows of walk into per-segment TurtleSegments arrays, numbering segments from first"""
+    lengths = np.frombuffer(rows.length, dtype=np.int64)
+    total = int(lengths.sum())
+    frames = table.as_array()
+    headings = frames[:, :, 2] * table.length
+    if total == 0:
+        empty = np.empty((0, 3))
+        return TurtleSegments(empty, empty.copy(), np.empty(0), np.empty(0, dtype=np.int32),
+                              np.empty(0, dtype=np.int64), np.empty((0, 3, 3)))
+
+    offsets = np.cumsum(lengths) - lengths
+    run_of = np.repeat(np.arange(len(lengths)), lengths)
+    step = np.arange(total) - offsets[run_of]
+    frame_ids = np.frombuffer(rows.frame, dtype=np.int64)[run_of]
+    heading = headings[frame_ids]
+    start = np.frombuffer(rows.start, dtype=float).reshape(-1, 3)[run_of] + step[:, None] * heading
+    parent = np.arange(first - 1, first + total - 1, dtype=np.int64)
+    parent[offsets] = np.frombuffer(rows.parent, dtype=np.int64)
+    depth = np.frombuffer(rows.depth, dtype=np.int32)[run_of]
+    return TurtleSegments(
+        start=start,
+        end=start + heading,
+        radius=radius * np.power(radius_reduction, depth, dtype=float),
+        depth=depth,
+        parent=parent,
+        frame=frames[frame_ids],
+    )
+
+
+def turn_quaternions(angle=DEFAULT_ANGLE, turn_axes=TURN_AXES):
+    """Rotation id of every byte value (0 for symbols that do not turn) and the (K, 4) w, x, y, z quaternions"""
+    ids = np.zeros(256, dtype=np.uint8)
+    quaternions = [(1.0, 0.0, 0.0, 0.0)]
+    for symbol, (axis, sign) in turn_axes.items():
+        ids[ord(symbol)] = len(quaternions)
+        half = sign * angle / 2
+        quaternions.append((math.cos(half),) + tuple(math.sin(half) * np.asarray(axis, dtype=float)))
+    return ids, np.array(quaternions)
+
+
+def prefix_rotations(quaternions, block_size=None):
+    """Running products q[i] * ... * q[0] of (N, 4) quaternions, later turns on the left.
+
+    A blocked scan: the sequence is cut into about sqrt(N) blocks that are
+    all scanned at once, one vectorized step per position in a block; the
+    block totals are scanned the same way and multiplied back in. That is
+    O(N) work in O(sqrt(N)) NumPy calls.
+    """
+    quaternions = np.asarray(quaternions, dtype=float)
+    n = len(quaternions)
+    if n == 0:
+        return quaternions.reshape(0, 4)
+    if block_size is None:
+        block_size = max(math.isqrt(n - 1) + 1, 2)
+    n_blocks = -(-n // block_size)
+    padded = np.zeros((n_blocks * block_size, 4))
+    padded[:, 0] = 1.0
+    padded[:n] = quaternions
+    # Component-major (4, position in block, block) so every step works on contiguous rows
+    w, x, y, z = np.ascontiguousarray(padded.reshape(n_blocks, block_size, 4).transpose(2, 1, 0))
+    for j in range(1, block_size):
+        aw, ax, ay, az = w[j], x[j], y[j], z[j]
+        bw, bx, by, bz = w[j - 1], x[j - 1], y[j - 1], z[j - 1]
+        w[j], x[j], y[j], z[j] = (aw * bw - ax * bx - ay * by - az * bz,
+                                  aw * bx + ax * bw + ay * bz - az * by,
+                                  aw * by - ax * bz + ay * bw + az * bx,
+                                  aw * bz + ax * by - ay * bx + az * bw)
+    if n_blocks > 1:
+        # Every block after the first is multiplied by the product of all earlier blocks
+        carry = prefix_rotations(np.stack([w[-1], x[-1], y[-1], z[-1]], axis=1))[:-1]
+        bw, bx, by, bz = carry[:, 0], carry[:, 1], carry[:, 2], carry[:, 3]
+        aw, ax, ay, az = w[:, 1:].copy(), x[:, 1:].copy(), y[:, 1:].copy(), z[:, 1:].copy()
+        w[:, 1:] = aw * bw - ax * bx - ay * by - az * bz
+        x[:, 1:] = aw * bx + ax * bw + ay * bz - az * by
+        y[:, 1:] = aw * by - ax * bz + ay * bw + az * bx
+        z[:, 1:] = aw * bz + ax * by - ay * bx + az * bw
+    scan = np.stack([w.T.ravel(), x.T.ravel(), y.T.ravel(), z.T.ravel()], axis=1)[:n]
+    return scan / np.linalg.norm(scan, axis=1, keepdims=True)
+
+
+def interpret_scan(symbols, angle=DEFAULT_ANGLE, length=1.0, radius=0.05, turn_axes=TURN_AXES, metrics=None):
+    """interpret() for L-systems without brackets, such as the Dragon, Koch, Hilbert and Peano curves.
+
+    Without brackets the turtle's orientation at every F is just the product
+    of all turns before it, and its position the sum of all headings before
+    it. Symbols are mapped to rotation ids with one table lookup, turn
+    quaternions are combined by prefix_rotations and positions come from
+    one cumsum, so no Python code runs per symbol.
+    """
+    import lsys_instances
+
+    with metrics.timer("interpret") if metrics is not None else nullcontext():
+        data = np.concatenate([np.frombuffer(chunk.encode("ascii") if isinstance(chunk, str) else bytes(chunk),
+                                             dtype=np.uint8) for chunk in _iter_chunks(symbols)] or [np.empty(0, np.uint8)])
+        if np.any((data == ord("[")) | (data == ord("]"))):
+            raise ValueError("interpret_scan needs an L-system without brackets, use interpret")
+        ids, quaternions = turn_quaternions(angle, turn_axes)
+        rotation_ids = ids[data]
+        turning = np.flatnonzero(rotation_ids)
+        draws = np.flatnonzero(data == ord("F"))
+        turns = rotation_ids[turning]
+        present = np.bincount(turns, minlength=len(quaternions)) > 0
+        symbols_used = [symbol for symbol in turn_axes if present[ids[ord(symbol)]]]
+        axes = {tuple(turn_axes[symbol][0]) for symbol in symbols_used}
+        if len(axes) == 1:
+            # Turns about a single axis commute: the orientation is an integer count of turns
+            signs = np.zeros(len(quaternions), dtype=np.int64)
+            for symbol in symbols_used:
+                signs[ids[ord(symbol)]] = turn_axes[symbol][1]
+            half = np.cumsum(signs[turns]) * (angle / 2)
+            scan = np.zeros((len(turns), 4))
+            scan[:, 0] = np.cos(half)
+            scan[:, 1:] = np.sin(half)[:, None] * np.asarray(axes.pop(), dtype=float)
+        else:
+            scan = prefix_rotations(quaternions[turns])
+        # Orientation after the k-th turn; an F sees every turn that comes before it
+        orientations = np.concatenate([quaternions[:1], scan])
+        frames = lsys_instances.quaternions_to_frames(orientations[np.searchsorted(turning, draws)])
+        heading = frames[:, :, 2] * length
+        end = np.cumsum(heading, axis=0)
+        n = len(draws)
+        if metrics is not None:
+            metrics.chunk(data, n)
+        return TurtleSegments(
+            start=end - heading,
+            end=end,
+            radius=np.full(n, float(radius)),
+            depth=np.zeros(n, dtype=np.int32),
+            parent=np.arange(-1, n - 1, dtype=np.int64),
+            frame=frames,
+        )
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    import lsys_metrics
+    import lsys_stream
+
+    # Profile interpretation of an L-system file on its own, without Blender
+    for file_path in sys.argv[1:]:
+        metrics = lsys_metrics.TurtleMetrics(file_path)
+        interpret(lsys_stream.iter_file_chunks(file_path), metrics=metrics)
+        print(json.dumps(metrics.summary(), indent=2))
@@ -0,0 +1,65 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from genlsys_3d_robust import generate_l_system, generate_param_l_system
+
+
+def generate_variant(config, seed, parametric=False):
+    """Expand one variant of a config; the result is a pure function of (config, seed)"""
+    generate = generate_param_l_system if parametric else generate_l_system
+    return generate(config["axiom"], config["rules"], config["iterations"], config["stochastic"], seed=seed)
+
+
+def variant_file_name(config, seed):
+    file_suffix = "stochastic" if config["stochastic"] else "deterministic"
+    return f"{config['name']}_{file_suffix}_seed{seed}.txt"
+
+
+def _generate_job(job):
+    config, seed, parametric, output_dir = job
+    l_system_string = generate_variant(config, seed, parametric)
+    if output_dir is None:
+        return l_system_string
+    # Workers write their own files so large strings never cross the process pipe
+    file_path = os.path.join(output_dir, variant_file_name(config, seed))
+    with open(file_path, "w") as file:
+        file.write(l_system_string)
+    return file_path
+
+
+def generate_variants(config, seeds, processes=None, output_dir=None, parametric=False):
+    """Generate one variant of config per seed on a process pool.
+
+    Returns the strings in seed order, or the written file paths when
+    output_dir is given. Every variant draws from its own random.Random(seed),
+    so results do not depend on the pool size or scheduling.
+    """
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    jobs = [(config, seed, parametric, output_dir) for seed in seeds]
+    if processes == 1:
+        return [_generate_job(job) for job in jobs]
+    workers = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_generate_job, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from genlsys_3d_robust import l_systems, param_l_systems
+
+    parser = argparse.ArgumentParser(description="Generate seeded variants of an L-system config")
+    parser.add_argument("name", help="config name from l_systems or param_l_systems")
+    parser.add_argument("output_dir")
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    configs = {config["name"]: (config, False) for config in l_systems}
+    configs.update({config["name"]: (config, True) for config in param_l_systems})
+    config, parametric = configs[args.name]
+    seeds = range(args.first_seed, args.first_seed + args.count)
+    paths = generate_variants(config, seeds, args.processes, args.output_dir, parametric)
+    print(f"Generated {len(paths)} variants of {args.name} in {args.output_dir}")
@@ -0,0 +1,53 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import lsys_batch
+import lsys_mesh
+
+
+@pytest.fixture
+def mock_writer():
+    # Installs lsys_mockbpy as bpy, so lsys_blender can be imported below
+    return lsys_batch.MockWriter()
+
+
+def test_empty_mesh_through_mock_bpy(mock_writer, tmp_path):
+    import bpy
+
+    import lsys_blender
+
+    mock_writer.reset()
+    lsys_blender.object_from_arrays("Empty", lsys_mesh.empty_mesh(), bpy.context.scene.collection)
+    bpy.ops.wm.save_as_mainfile(filepath=str(tmp_path / "empty.npz"))
+    arrays = np.load(tmp_path / "empty.npz")
+    assert arrays["Empty.vertices.co"].shape == (0, 3)
+    assert arrays["Empty.loops.vertex_index"].shape == (0, 1)
+
+
+def test_batch_writes_configs_without_geometry(mock_writer, tmp_path):
+    jobs = [dict(lsys_batch.JOB_DEFAULTS, config=config, seed=0, iterations=3, name=config)
+            for config in ("CantorSet", "BinaryTree", "FractalPlant")]
+    records = lsys_batch.run_batch(jobs, str(tmp_path), mock_writer)
+    assert [record.get("error") for record in records] == [None] * 3
+    assert all(os.path.exists(tmp_path / record["path"]) for record in records)
+
+
+class FailingWriter(lsys_batch.MockWriter):
+    def write(self, job, branches, leaves, file_path):
+        if job["config"] == "BinaryTree":
+            raise RuntimeError("disk full")
+        super().write(job, branches, leaves, file_path)
+
+
+def test_failing_job_is_skipped(tmp_path):
+    jobs = [dict(lsys_batch.JOB_DEFAULTS, config=config, seed=0, iterations=2, name=config)
+            for config in ("FractalPlant", "BinaryTree", "BushyTree")]
+    records = lsys_batch.run_batch(jobs, str(tmp_path), FailingWriter())
+    assert [record["name"] for record in records] == ["FractalPlant", "BinaryTree", "BushyTree"]
+    assert records[1]["error"] == "RuntimeError: disk full"
+    assert "error" not in records[0] and "error" not in records[2]
+    with open(tmp_path / "index-0.jsonl") as index:
+        assert [json.loads(line)["name"] for line in index] == ["FractalPlant", "BinaryTree", "BushyTree"]
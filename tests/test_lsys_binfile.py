@@ -0,0 +1,26 @@
+import os
+
+import numpy as np
+import pytest
+
+import lsys_binfile
+import lsys_brackets
+import lsys_rewrite
+
+SYMBOLS = lsys_rewrite.generate("X", {"X": "F+[[X]-X]-F[-FX]+X", "F": "FF"}, 6)
+
+
+@pytest.mark.parametrize("codec", lsys_binfile.CODECS)
+def test_brackets_with_and_without_stored_index(codec, tmp_path):
+    file_path = tmp_path / "tree.lsyb"
+    lsys_binfile.write_lsystem_file(file_path, [SYMBOLS], codec=codec, block_size=1000)
+    with lsys_binfile.LSystemFile(file_path) as binary_file:
+        assert binary_file.header["bracket_index"] == (codec != "none")
+        assert np.array_equal(binary_file.brackets, lsys_brackets.bracket_pairs(SYMBOLS))
+        assert binary_file.read() == SYMBOLS.encode("ascii")
+
+
+def test_uncompressed_file_is_about_the_size_of_the_text(tmp_path):
+    file_path = tmp_path / "tree.lsyb"
+    lsys_binfile.write_lsystem_file(file_path, [SYMBOLS], codec="none", rle=False)
+    assert os.path.getsize(file_path) < 1.05 * len(SYMBOLS)
@@ -0,0 +1,15 @@
+import lsys_param
+
+
+def test_tiny_parameters_survive_formatting():
+    modules = lsys_param.parse_modules("F(1e-07)A(6.103515625e-05,-2.5e-300)F(1)")
+    text = lsys_param.format_modules(modules)
+    assert list(lsys_param.parse_modules(text).params) == [1e-07, 6.103515625e-05, -2.5e-300, 1.0]
+
+
+def test_tiny_parameters_survive_generations():
+    rules = {"F(x)": "F({0}*0.5)[+F({0}*0.5)]"}
+    modules = lsys_param.generate("F(1e-07)", rules, 3)
+    reparsed = lsys_param.parse_modules(lsys_param.format_modules(modules))
+    assert list(reparsed.params) == list(modules.params)
+    assert min(modules.params) == 1e-07 / 8